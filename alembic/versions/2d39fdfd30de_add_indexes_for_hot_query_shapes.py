@@ -0,0 +1,44 @@
+"""add indexes for hot query shapes
+
+Revision ID: 2d39fdfd30de
+Revises: df4aa7b6dadb
+Create Date: 2026-10-18 12:05:30.430390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d39fdfd30de'
+down_revision: Union[str, None] = 'df4aa7b6dadb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# phone_numbers.phone_number is already covered by the index behind its
+# unique constraint, so it is not repeated here.
+#
+# CONCURRENTLY cannot run inside a transaction, hence the autocommit blocks.
+# It also means a failed build can leave an INVALID index behind; if_not_exists
+# lets the upgrade be re-run after dropping it.
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_hall_floors_age_ranges', 'hall_floors', ['age_ranges'], unique=False, postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_hall_floors_hall_id_floor_no', 'hall_floors', ['hall_id', 'floor_no'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_hall_floors_open', 'hall_floors', ['hall_id', 'floor_no'], unique=False, postgresql_where=sa.text("status = 'not-full'"), postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_users_floor_active_status', 'users', ['floor', 'active_status'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_users_phone_number_id', 'users', ['phone_number_id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_phone_number_id', table_name='users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_users_floor_active_status', table_name='users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_hall_floors_open', table_name='hall_floors', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_hall_floors_hall_id_floor_no', table_name='hall_floors', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_hall_floors_age_ranges', table_name='hall_floors', postgresql_concurrently=True, if_exists=True)
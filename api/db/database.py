@@ -1,14 +1,83 @@
-from sqlalchemy import create_engine
-from sqlalchemy.pool import NullPool
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool, QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+import logging, os, threading, time
 from dotenv import load_dotenv
 
 load_dotenv(".env.config")
 
+# "null"      - open a fresh connection per session. Right behind Supabase's
+#               PgBouncer in session mode, where pooling twice exhausts its
+#               client slots.
+# "queue"     - keep a pool of open connections; for a direct Postgres.
+# "pgbouncer" - pooled, but safe for PgBouncer in transaction mode: no
+#               server-side prepared statements survive across transactions.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "null")
+# The asyncpg engine behind the registration and ticketing write routes.
+# Unpooled, every asyncpg connection repeats its type introspection and
+# write throughput roughly halves, so it pools by default. Use "pgbouncer"
+# behind a transaction-mode pooler; "null" only where DB_POOL_SIZE +
+# DB_MAX_OVERFLOW more client connections can't be spared.
+ASYNC_DB_POOL_MODE = os.getenv("ASYNC_DB_POOL_MODE", "queue")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+# Connections opened at startup; defaults to the pool size
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", DB_POOL_SIZE))
 
-def get_db_engine():
+POOL_MODES = ("null", "queue", "pgbouncer")
+
+# Optional read replica for the heavy read-only routes; unset means every
+# read goes to the primary
+READ_DB_URL = os.getenv("READ_DB_URL")
+# Staleness policy: reads fall back to the primary while the replica is more
+# than this many seconds behind, or unreachable
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 10))
+# How often replica health and lag are re-checked
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", 5))
+
+logger = logging.getLogger(__name__)
+
+
+def pool_options(url: str, mode: str = DB_POOL_MODE) -> dict:
+    """
+    create_engine keyword arguments for a pooling mode.
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"Unknown DB_POOL_MODE {mode!r}, expected one of {POOL_MODES}")
+
+    if mode == "null":
+        return {"poolclass": NullPool, "pool_pre_ping": True}
+
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+    if not make_url(url).get_dialect().is_async:
+        options["poolclass"] = QueuePool
+
+    if mode == "pgbouncer":
+        # psycopg2 never prepares server-side; the other drivers do by default
+        driver = make_url(url).get_driver_name()
+        if driver == "psycopg":
+            options["connect_args"] = {"prepare_threshold": None}
+        elif driver == "asyncpg":
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+            }
+    return options
+
+
+def get_db_engine(mode: str = DB_POOL_MODE):
     DB_TYPE = os.getenv("DB_TYPE")
     DB_NAME = os.getenv("DB_NAME")
     DB_USER = os.getenv("DB_USER")
@@ -18,23 +87,132 @@ def get_db_engine():
 
     DATABASE_URL = os.getenv("DB_URL")
 
-    # Use NullPool when connecting through Supabase's PgBouncer pooler.
-    # SQLAlchemy must NOT maintain its own pool on top of PgBouncer —
-    # that causes double-pooling and exhausts PgBouncer's client slots.
-    db_engine = create_engine(
-        DATABASE_URL,
-        poolclass=NullPool,
-        pool_pre_ping=True,
-    )
+    db_engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL, mode))
 
     return db_engine
 
 
+def get_async_db_url() -> str:
+    """
+    ASYNC_DB_URL if set, otherwise DB_URL with its driver swapped for asyncpg.
+    """
+    if os.getenv("ASYNC_DB_URL"):
+        return os.getenv("ASYNC_DB_URL")
+
+    url = make_url(os.getenv("DB_URL")).set(drivername="postgresql+asyncpg")
+    # asyncpg spells libpq's sslmode as ssl
+    if "sslmode" in url.query:
+        url = url.difference_update_query(["sslmode"]).update_query_dict(
+            {"ssl": url.query["sslmode"]}
+        )
+    return url.render_as_string(hide_password=False)
+
+
+def get_async_db_engine(mode: str = ASYNC_DB_POOL_MODE):
+    ASYNC_DATABASE_URL = get_async_db_url()
+    return create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL, mode))
+
+
+def get_read_db_engine(mode: str = DB_POOL_MODE):
+    if not READ_DB_URL:
+        return None
+    return create_engine(READ_DB_URL, **pool_options(READ_DB_URL, mode))
+
+
+# Zero on a primary, and on a replica that has replayed everything it has
+# received (replay_timestamp alone would grow while the primary is idle)
+REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class ReplicaMonitor:
+    """
+    Decides whether reads may go to the replica, re-checking its lag at most
+    every REPLICA_CHECK_INTERVAL seconds so requests don't pay for the check.
+    """
+
+    def __init__(self, engine, max_lag: float = REPLICA_MAX_LAG_SECONDS, interval: float = REPLICA_CHECK_INTERVAL):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.usable = False
+        self.lag = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def check(self) -> None:
+        try:
+            with self.engine.connect() as connection:
+                self.lag = float(connection.execute(REPLICA_LAG_SQL).scalar() or 0)
+        except OperationalError as exc:
+            if self.usable or self.checked_at is None:
+                logger.warning("Read replica unavailable, reading from the primary: %s", exc)
+            self.usable, self.lag = False, None
+        else:
+            usable = self.lag <= self.max_lag
+            if not usable and (self.usable or self.checked_at is None):
+                logger.warning(
+                    "Read replica is %.1fs behind (limit %.1fs), reading from the primary",
+                    self.lag,
+                    self.max_lag,
+                )
+            self.usable = usable
+        self.checked_at = time.monotonic()
+
+    def is_usable(self) -> bool:
+        if self.checked_at is None or time.monotonic() - self.checked_at >= self.interval:
+            with self.lock:
+                # Another thread may have checked while we waited
+                if self.checked_at is None or time.monotonic() - self.checked_at >= self.interval:
+                    self.check()
+        return self.usable
+
+    def mark_down(self) -> None:
+        """
+        Stops using the replica until the next check, after a request hit a
+        connection error on it.
+        """
+        self.usable = False
+        self.checked_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "configured": True,
+            "usable": self.usable,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
 # Call get_db_engine to create the engine
 db_engine = get_db_engine()
+async_db_engine = get_async_db_engine()
+read_db_engine = get_read_db_engine()
+replica_monitor = ReplicaMonitor(read_db_engine) if read_db_engine is not None else None
 
 # Session and Base declaration
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+ReadSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=read_db_engine)
+    if read_db_engine is not None
+    else None
+)
+# expire_on_commit=False: an expired attribute would need a lazy load, which
+# AsyncSession cannot do implicitly
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_db_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
 
@@ -42,9 +220,99 @@ def create_database():
     return Base.metadata.create_all(bind=db_engine)
 
 
+def warm_up_pool(engine=db_engine, connections: int = DB_POOL_WARMUP) -> int:
+    """
+    Opens `connections` connections up front so the first requests after a
+    deploy don't each pay for a TCP and TLS handshake. Returns how many were
+    opened; NullPool keeps nothing, so there is nothing to warm.
+    """
+    if isinstance(engine.pool, NullPool) or connections <= 0:
+        return 0
+
+    # Anything past pool_size is overflow and would be closed on return
+    connections = min(connections, engine.pool.size())
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(engine.connect())
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+async def warm_up_async_pool(engine=async_db_engine, connections: int = DB_POOL_WARMUP) -> int:
+    """
+    warm_up_pool for the async engine.
+    """
+    if isinstance(engine.pool, NullPool) or connections <= 0:
+        return 0
+
+    connections = min(connections, engine.pool.size())
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(await engine.connect())
+    finally:
+        for connection in opened:
+            await connection.close()
+    return len(opened)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def open_read_session():
+    """
+    A session on the replica when it is healthy and fresh enough, otherwise
+    on the primary. Only for code that never writes.
+
+    The replica connection is checked out (and pre-pinged) up front, so a
+    replica that went down since the last check sends this request to the
+    primary instead of failing it.
+    """
+    if replica_monitor is not None and replica_monitor.is_usable():
+        db = ReadSessionLocal()
+        try:
+            db.connection()
+        except OperationalError as exc:
+            db.close()
+            logger.warning("Read replica unavailable, reading from the primary: %s", exc)
+            replica_monitor.mark_down()
+        else:
+            replica_monitor.replica_reads += 1
+            return db
+    if replica_monitor is not None:
+        replica_monitor.primary_reads += 1
+    return SessionLocal()
+
+
+def replica_stats() -> dict:
+    if replica_monitor is None:
+        return {"configured": False}
+    return replica_monitor.stats()
+
+
+def get_read_db():
+    db = open_read_session()
+    try:
+        yield db
+    except OperationalError:
+        # The replica failed mid-request, after its connection was checked
+        # out. The endpoint has already run, so this request is not retried;
+        # later ones go to the primary until the replica checks out again.
+        if replica_monitor is not None and db.get_bind() is read_db_engine:
+            replica_monitor.mark_down()
+        raise
+    finally:
+        db.close()
@@ -1,23 +1,33 @@
 from api.v1.schemas.floor_management import FloorCreateSchema
 from api.v1.models.phone_number import PhoneNumber
 from api.v1.models.floor import HallFloors
+from api.v1.models.floor_bed import FloorBed, FloorBackupSlot
+from api.v1.models.category import Category
+from api.db.database import SessionLocal
+from api.utils.floor_occupancy import track_user_removed
+from api.utils.floor_eligibility import floor_eligibility
 from typing import Optional, List, Tuple
 from api.v1.models.user import User
 from api.v1.models.hall import Hall
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from sqlalchemy import case, and_
-import re
+from sqlalchemy import case, and_, func, select, update
+from dotenv import load_dotenv
+import logging, re, os, threading
 
+load_dotenv(".env")
 
-def beds_required(
-    no_children: Optional[int],
-    last_assigned_bed: int,
-    counter_value: int,
-    bunk_size: int = 2,
-) -> Tuple[List[str], int, int]:
+logger = logging.getLogger(__name__)
+
+# "skip-locked" picks and locks a single floor across all eligible halls in one
+# round trip; "per-hall" is the original hall-by-hall FOR UPDATE scan. Kept
+# switchable so both paths can be load-tested against each other.
+BED_ALLOCATION_MODE = os.getenv("BED_ALLOCATION_MODE", "skip-locked")
+
+
+def beds_required(no_children: Optional[int]) -> int:
     """
-    Returns allocated bed labels and updated counters.
+    Returns the number of beds a registrant needs.
 
     - Allocates 1 bed if children are 0 or None
     - Allocates 2 beds if 1 <= children <= 2
@@ -25,26 +35,174 @@ def beds_required(
     """
 
     if no_children is None or no_children == 0:
-        beds_needed = 1
+        return 1
     elif 1 <= no_children <= 2:
-        beds_needed = 2
-    else:
-        beds_needed = 4
-    allocated_beds: List[str] = []
+        return 2
+    return 4
+
+
+def bed_labels(no_beds: Optional[int], bunk_size: int = 2) -> List[Tuple[int, str]]:
+    """
+    Returns every (bed_no, bed_label) pair on a floor with `no_beds` bunks,
+    e.g. 2 bunks -> (1, "1a"), (1, "1b"), (2, "2a"), (2, "2b").
+    """
+    return [
+        (bed_no, f"{bed_no}{chr(ord('a') + sub_bed)}")
+        for bed_no in range(1, (no_beds or 0) + 1)
+        for sub_bed in range(bunk_size)
+    ]
+
+
+def free_beds_available(floor_id, count: int = 1):
+    """
+    EXISTS clause that is true when the floor has at least `count` free beds.
+    Served from the partial free-bed index, so it never scans occupied rows.
+    """
+    return (
+        select(FloorBed.id)
+        .where(FloorBed.floor_id == floor_id, FloorBed.occupied.is_(False))
+        .offset(count - 1)
+        .limit(1)
+        .exists()
+    )
+
+
+def floor_has_free_beds(db: Session, floor_id, count: int = 1) -> bool:
+    return db.query(free_beds_available(floor_id, count)).scalar()
+
+
+def sync_floor_beds(db: Session, floor: HallFloors) -> None:
+    """
+    Brings a floor's bed ledger in line with its `no_beds`.
+
+    Missing beds are added as free. Free beds beyond the new size are removed;
+    occupied ones are left in place until their occupant is released.
+    """
+    existing = {
+        label
+        for (label,) in db.query(FloorBed.bed_label).filter(
+            FloorBed.floor_id == floor.floor_id
+        )
+    }
+
+    for bed_no, label in bed_labels(floor.no_beds):
+        if label not in existing:
+            db.add(FloorBed(floor_id=floor.floor_id, bed_no=bed_no, bed_label=label, occupied=False))
+
+    db.query(FloorBed).filter(
+        FloorBed.floor_id == floor.floor_id,
+        FloorBed.bed_no > (floor.no_beds or 0),
+        FloorBed.occupied.is_(False),
+    ).delete(synchronize_session=False)
+
+    # One backup (child) slot per bunk: "1c" .. "{no_beds}c"
+    existing_slots = {
+        label
+        for (label,) in db.query(FloorBackupSlot.slot_label).filter(
+            FloorBackupSlot.floor_id == floor.floor_id
+        )
+    }
+    for slot_no in range(1, (floor.no_beds or 0) + 1):
+        label = f"{slot_no}c"
+        if label not in existing_slots:
+            db.add(FloorBackupSlot(floor_id=floor.floor_id, slot_no=slot_no, slot_label=label, occupied=False))
+
+    db.query(FloorBackupSlot).filter(
+        FloorBackupSlot.floor_id == floor.floor_id,
+        FloorBackupSlot.slot_no > (floor.no_beds or 0),
+        FloorBackupSlot.occupied.is_(False),
+    ).delete(synchronize_session=False)
 
-    for _ in range(beds_needed):
-        # Calculate sub-bed letter (a, b, ...)
-        sub_bed_letter = chr(ord("a") + counter_value)
-        bed_label = f"{last_assigned_bed}{sub_bed_letter}"
-        allocated_beds.append(bed_label)
+    db.flush()
+    floor.status = "not-full" if floor_has_free_beds(db, floor.floor_id) else "full"
 
-        # Update counters
-        counter_value += 1
-        if counter_value >= bunk_size:
-            counter_value = 0
-            last_assigned_bed += 1
 
-    return allocated_beds, last_assigned_bed, counter_value
+# Floors allocate_bed moves on to after a short claim before giving up
+BED_CLAIM_RETRIES = int(os.getenv("BED_CLAIM_RETRIES", 3))
+
+
+class BedClaimError(RuntimeError):
+    """Fewer free beds could be claimed on a floor than were needed."""
+
+
+def claim_floor_beds(db: Session, floor: HallFloors, count: int) -> List[str]:
+    """
+    Claims the `count` lowest free beds on a floor in a single UPDATE and
+    returns their labels. Marks the floor full once no free bed remains.
+
+    Beds locked or taken by a concurrent transaction are skipped, so the
+    UPDATE can come back short; the beds it did get are handed back and
+    BedClaimError is raised instead of returning a partial allocation.
+    """
+    free_ids = (
+        select(FloorBed.id)
+        .where(FloorBed.floor_id == floor.floor_id, FloorBed.occupied.is_(False))
+        .order_by(FloorBed.bed_no, FloorBed.bed_label)
+        .limit(count)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    claimed = db.execute(
+        update(FloorBed)
+        .where(FloorBed.id.in_(free_ids))
+        .values(occupied=True)
+        .returning(FloorBed.bed_no, FloorBed.bed_label)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    if len(claimed) < count:
+        if claimed:
+            db.query(FloorBed).filter(
+                FloorBed.floor_id == floor.floor_id,
+                FloorBed.bed_label.in_([label for _, label in claimed]),
+            ).update({FloorBed.occupied: False}, synchronize_session=False)
+        raise BedClaimError(
+            f"Claimed {len(claimed)} of {count} beds on floor {floor.floor_id}"
+        )
+
+    if not floor_has_free_beds(db, floor.floor_id):
+        floor.status = "full"
+
+    return [label for _, label in sorted(claimed)]
+
+
+def release_floor_beds(db: Session, floor_id, labels: List[str]) -> None:
+    """
+    Returns beds to a floor's free pool and reopens the floor.
+    """
+    labels = [label for label in labels if label]
+    if not floor_id or not labels:
+        return
+
+    # Backup (child) slots are labelled "{n}c" and live in their own table
+    backup_labels = [label for label in labels if label.endswith("c")]
+    main_labels = [label for label in labels if not label.endswith("c")]
+
+    if backup_labels:
+        db.query(FloorBackupSlot).filter(
+            FloorBackupSlot.floor_id == floor_id,
+            FloorBackupSlot.slot_label.in_(backup_labels),
+        ).update({FloorBackupSlot.occupied: False}, synchronize_session=False)
+
+    released = 0
+    if main_labels:
+        released = (
+            db.query(FloorBed)
+            .filter(
+                FloorBed.floor_id == floor_id,
+                FloorBed.bed_label.in_(main_labels),
+                FloorBed.occupied.is_(True),
+            )
+            .update({FloorBed.occupied: False}, synchronize_session=False)
+        )
+    if released:
+        db.query(HallFloors).filter(HallFloors.floor_id == floor_id).update(
+            {HallFloors.status: "not-full"}, synchronize_session=False
+        )
+
+
+def user_bed_labels(user: User) -> List[str]:
+    return [user.bed_number, *(user.extra_beds or [])]
 
 
 def floor_create_logic(
@@ -72,8 +230,44 @@ def gender_classifier(category: str) -> str:
     return "unspecified"
 
 
+class CategoryGenderMap:
+    """
+    category_name -> gender, as stored on each Category row.
+
+    Loaded at startup and reloaded by create_category/delete_category.
+    Names it doesn't know yet (a category created through another worker,
+    or free text) fall back to gender_classifier, which is what the stored
+    values were computed with.
+    """
+
+    def __init__(self):
+        self.genders: dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def refresh(self, db: Optional[Session] = None) -> None:
+        if db is None:
+            with SessionLocal() as session:
+                return self.refresh(session)
+
+        genders = {
+            name: gender or gender_classifier(name)
+            for name, gender in db.query(Category.category_name, Category.gender)
+        }
+        with self.lock:
+            self.genders = genders
+
+    def get(self, category: str) -> str:
+        gender = self.genders.get(category)
+        if gender is None:
+            gender = gender_classifier(category)
+        return gender
+
+
+category_genders = CategoryGenderMap()
+
+
 def validate_gender(category: str) -> str:
-    gender = gender_classifier(category)
+    gender = category_genders.get(category)
     if gender not in {"male", "female"}:
         raise HTTPException(status_code=400, detail="Invalid gender classification")
     return gender
@@ -116,6 +310,57 @@ def fetch_user_information_for_reallocation(
 
 
 def allocate_bed(db: Session, gender: str, payload):
+    if BED_ALLOCATION_MODE == "per-hall":
+        return allocate_bed_per_hall(db, gender, payload)
+    return allocate_bed_skip_locked(db, gender, payload)
+
+
+def allocate_bed_skip_locked(db: Session, gender: str, payload):
+    """
+    Picks and locks exactly one eligible floor in a single query. The
+    eligible floors come from the precomputed floor_eligibility index, so
+    only fill state is checked in SQL.
+
+    Floors already locked by a concurrent registration are skipped instead of
+    waited on, so contending requests fall through to the next free floor.
+    """
+    needed = beds_required(payload.no_children)
+    candidates = floor_eligibility.candidates(db, gender, payload.category, payload.age_range)
+
+    # A short claim (see claim_floor_beds) moves on to the next floor
+    for _ in range(BED_CLAIM_RETRIES):
+        if not candidates:
+            break
+        row = (
+            db.query(HallFloors, Hall)
+            .join(Hall, Hall.id == HallFloors.hall_id)
+            .filter(
+                HallFloors.floor_id.in_(candidates),
+                HallFloors.status == "not-full",
+                free_beds_available(HallFloors.floor_id, needed),
+            )
+            .order_by(Hall.id, HallFloors.floor_no)
+            .with_for_update(skip_locked=True, of=HallFloors)
+            .limit(1)
+            .first()
+        )
+        if row is None:
+            break
+
+        floor, hall = row
+        try:
+            beds = claim_floor_beds(db, floor, needed)
+        except BedClaimError as e:
+            logger.warning("%s, trying the next floor", e)
+            candidates = [floor_id for floor_id in candidates if floor_id != floor.floor_id]
+            continue
+        return hall, floor, beds
+
+    return None, None, None
+
+
+def allocate_bed_per_hall(db: Session, gender: str, payload):
+    needed = beds_required(payload.no_children)
     eligible_halls = (
         db.query(Hall)
         .filter((Hall.gender == gender) | (Hall.hall_name == "Jerusalem Hall"))
@@ -137,81 +382,50 @@ def allocate_bed(db: Session, gender: str, payload):
             .all()
         )
         for floor in floors:
-            bunk_size = 2
-
-            total_beds = floor.no_beds * bunk_size
-            assigned = ((floor.last_assigned_bed - 1) * bunk_size) + floor.counter_value
-
-            if assigned < total_beds:
-                beds, next_bed, next_counter = beds_required(
-                    payload.no_children,
-                    floor.last_assigned_bed,
-                    floor.counter_value,
-                    bunk_size,
-                )
-
-                floor.last_assigned_bed = next_bed
-                floor.counter_value = next_counter
-
-                if (((next_bed - 1) * bunk_size) + next_counter) >= total_beds:
-                    floor.status = "full"
-
+            if floor_has_free_beds(db, floor.floor_id, needed):
+                try:
+                    beds = claim_floor_beds(db, floor, needed)
+                except BedClaimError as e:
+                    logger.warning("%s, trying the next floor", e)
+                    continue
                 return hall, floor, beds
 
     return None, last_hall, None
 
 
 def allocate_backup_bed(db: Session, gender: str, payload):
-    eligible_halls = (
-        db.query(Hall)
-        .filter((Hall.gender == gender) | (Hall.hall_name == "Jerusalem Hall"))
-        .all()
-    )
+    """
+    Claims the lowest free backup (child) slot across all eligible floors.
 
-    for hall in eligible_halls:
-        floors = (
-            db.query(HallFloors)
-            .filter(
-                HallFloors.hall_id == hall.id,
-                HallFloors.status == "not-full",
-                HallFloors.categories.any(category_name=payload.category),
-                HallFloors.age_ranges.contains([payload.age_range]),
-            )
-            .order_by(HallFloors.floor_no)
-            .with_for_update()
-            .all()
+    The slot row is located through the partial free-slot index and locked
+    with SKIP LOCKED, so no scan of `users` is needed and concurrent backup
+    registrations never wait on each other.
+    """
+    candidates = floor_eligibility.candidates(db, gender, payload.category, payload.age_range)
+    if not candidates:
+        return None, None, None
+
+    row = (
+        db.query(FloorBackupSlot, HallFloors, Hall)
+        .join(HallFloors, HallFloors.floor_id == FloorBackupSlot.floor_id)
+        .join(Hall, Hall.id == HallFloors.hall_id)
+        .filter(
+            FloorBackupSlot.floor_id.in_(candidates),
+            HallFloors.status == "not-full",
+            FloorBackupSlot.occupied.is_(False),
         )
+        .order_by(Hall.id, HallFloors.floor_no, FloorBackupSlot.slot_no)
+        .with_for_update(skip_locked=True, of=FloorBackupSlot)
+        .limit(1)
+        .first()
+    )
+    if row is None:
+        return None, None, None
 
-        for floor in floors:
-            max_child_slots = floor.no_beds
-            if max_child_slots <= 0:
-                continue
-
-            # Lock users implicitly by querying under the same transaction
-            #Filter users on the floor to get occupied child slots
-            occupied_slots = {
-                user.bed_number
-                for user in (
-                    db.query(User).filter(
-                        User.floor == floor.floor_id,
-                        User.bed_number.ilike("%c"),
-                    ).with_for_update().all()
-                )
-            }
-            
-            all_slots = [f"{i}c" for i in range(1, max_child_slots + 1)]
-            available_slots = [slot for slot in all_slots if slot not in occupied_slots]
-
-            if not available_slots:
-                floor.status = "full"
-                continue
-
-            # Allocate lowest available child slot
-            assigned_slot = available_slots[0]
-
-            return hall, floor, [assigned_slot]
+    slot, floor, hall = row
+    slot.occupied = True
 
-    return None, None, None
+    return hall, floor, [slot.slot_label]
 
 
 # function to update a users information
@@ -231,28 +445,25 @@ def update_lateuser_information(db: Session, phone: str):
             status_code=404, detail="No user registered with this number."
         )
 
-    # delete the users record
+    # return the user's beds to the pool before deleting the record
+    release_floor_beds(db, user_record.floor, user_bed_labels(user_record))
+    track_user_removed(db, user_record)
     db.delete(user_record)
     db.delete(phone_record)
     db.commit()
 
 
 def compute_hall_statistics(db: Session, hall: Hall) -> dict:
-    floors = db.query(HallFloors).filter(HallFloors.hall_id == hall.id).all()
-
-    total_beds = sum(floor.no_beds for floor in floors)
-
-    all_users_count = 0
-    active_users_count = 0
-
-    for floor in floors:
-        all_users_count += db.query(User).filter(User.floor == floor.floor_id).count()
-
-        active_users_count += (
-            db.query(User)
-            .filter(User.floor == floor.floor_id, User.active_status == "active")
-            .count()
+    # Single aggregate over the per-floor occupancy counters
+    total_beds, all_users_count, active_users_count = (
+        db.query(
+            func.coalesce(func.sum(HallFloors.no_beds), 0),
+            func.coalesce(func.sum(HallFloors.all_users_count), 0),
+            func.coalesce(func.sum(HallFloors.active_users_count), 0),
         )
+        .filter(HallFloors.hall_id == hall.id)
+        .one()
+    )
 
     return {
         "total_beds": total_beds,
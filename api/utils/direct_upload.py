@@ -0,0 +1,193 @@
+from api.utils.file_upload import (
+    MAX_UPLOAD_BYTES,
+    RENDITIONS,
+    create_upload_presigned_post,
+    delete_from_s3,
+    download_from_s3,
+    head_s3_object,
+    render_profile_picture,
+    run_image_job,
+    rendition_key,
+    run_s3_job,
+    upload_profile_picture,
+)
+from api.v1.models.minister import Minister
+from api.db.database import SessionLocal
+from api.v1.models.user import User
+from fastapi import HTTPException, status
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import func
+from dotenv import load_dotenv
+import asyncio, jwt, logging, os, uuid
+
+load_dotenv(".env")
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_TOKEN_SECRET = os.getenv("UPLOAD_TOKEN_SECRET")
+UPLOAD_SESSION_EXPIRATION = int(os.getenv("UPLOAD_SESSION_EXPIRATION", 900))
+# Finalized tokens only have to outlive filling in the registration form
+UPLOAD_TOKEN_EXPIRATION = int(os.getenv("UPLOAD_TOKEN_EXPIRATION", 3600))
+
+ALLOWED_UPLOAD_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+}
+
+TOKEN_ALGORITHM = "HS256"
+
+
+def _secret() -> str:
+    if not UPLOAD_TOKEN_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Direct uploads are not configured.",
+        )
+    return UPLOAD_TOKEN_SECRET
+
+
+def _encode(claims: dict, expires_in: int) -> str:
+    claims["exp"] = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+    return jwt.encode(claims, _secret(), algorithm=TOKEN_ALGORITHM)
+
+
+def _decode(token: str, stage: str) -> dict:
+    try:
+        claims = jwt.decode(token, _secret(), algorithms=[TOKEN_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=400, detail="Upload token has expired.")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=400, detail="Invalid upload token.")
+
+    if claims.get("stage") != stage:
+        raise HTTPException(status_code=400, detail="Invalid upload token.")
+    return claims
+
+
+def create_upload_session(number: str, content_type: str) -> dict:
+    """
+    A presigned POST for one raw upload under users/{number}/uploads/ and
+    the token that later finalizes it. The processed picture gets its own
+    key, so the browser can never write to where the served image lives.
+    """
+    ext = ALLOWED_UPLOAD_TYPES.get(content_type)
+    if ext is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported image type. Use one of: {', '.join(ALLOWED_UPLOAD_TYPES)}.",
+        )
+
+    upload_id = uuid.uuid4().hex
+    raw_key = f"users/{number}/uploads/{upload_id}.{ext}"
+    object_key = f"users/{number}/{upload_id}.jpg"
+
+    try:
+        post = create_upload_presigned_post(
+            raw_key, content_type, MAX_UPLOAD_BYTES, UPLOAD_SESSION_EXPIRATION
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    token = _encode(
+        {"stage": "upload", "sub": number, "raw": raw_key, "key": object_key},
+        UPLOAD_SESSION_EXPIRATION,
+    )
+    return {
+        "url": post["url"],
+        "fields": post["fields"],
+        "upload_token": token,
+        "object_key": object_key,
+        "max_bytes": MAX_UPLOAD_BYTES,
+        "expires_in": UPLOAD_SESSION_EXPIRATION,
+    }
+
+
+async def finalize_upload(token: str) -> tuple[dict, str]:
+    """
+    Checks the browser's upload actually landed and returns the claims plus
+    a finalized token for register-user. Resizing is left to the caller to
+    queue so the response doesn't wait on it.
+    """
+    claims = _decode(token, "upload")
+
+    try:
+        head = await run_s3_job(head_s3_object, claims["raw"])
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    if head is None:
+        raise HTTPException(status_code=400, detail="Upload not found. Upload the file first.")
+
+    # The POST policy enforces both already; this guards against a policy
+    # that was loosened or an object written by other means
+    if head.get("ContentLength", 0) > MAX_UPLOAD_BYTES or not head.get(
+        "ContentType", ""
+    ).startswith("image/"):
+        await run_s3_job(delete_from_s3, claims["raw"])
+        raise HTTPException(status_code=400, detail="Uploaded file is not an accepted image.")
+
+    finalized = _encode(
+        {"stage": "finalized", "sub": claims["sub"], "key": claims["key"]},
+        UPLOAD_TOKEN_EXPIRATION,
+    )
+    return claims, finalized
+
+
+async def process_direct_upload(raw_key: str, object_key: str) -> None:
+    """
+    Background step after finalize: render the raw upload into the served
+    picture and its renditions, then drop the original. Failures are logged; the raw object is
+    kept so the upload can be reprocessed.
+    """
+    try:
+        raw_bytes = await run_s3_job(download_from_s3, raw_key)
+        rendered = await run_image_job(render_profile_picture, file_bytes=raw_bytes)
+        await upload_profile_picture(rendered, object_key)
+        # The user may already have registered with this upload
+        await asyncio.to_thread(mark_renditions_ready, [object_key])
+        await run_s3_job(delete_from_s3, raw_key)
+    except Exception:
+        logger.exception("Processing direct upload %s failed", raw_key)
+
+
+def mark_renditions_ready(object_keys: list[str]) -> int:
+    """
+    Sets renditions_at on the users and ministers whose pictures now have
+    every rendition, so list views start serving thumbnails.
+    """
+    with SessionLocal() as db:
+        marked = 0
+        for model in (User, Minister):
+            marked += (
+                db.query(model)
+                .filter(model.object_key.in_(object_keys), model.renditions_at.is_(None))
+                .update({model.renditions_at: func.now()}, synchronize_session=False)
+            )
+        db.commit()
+    return marked
+
+
+async def renditions_ready_at(object_key: str) -> Optional[datetime]:
+    """
+    Now, if the renditions of a direct upload are already written; None while
+    its background resize is still running (process_direct_upload marks the
+    record once it is done).
+    """
+    try:
+        for name in RENDITIONS:
+            if await run_s3_job(head_s3_object, rendition_key(object_key, name)) is None:
+                return None
+    except RuntimeError:
+        return None
+    return datetime.now(timezone.utc)
+
+
+def object_key_from_upload_token(token: str, number: str) -> str:
+    """
+    The processed picture's key for a finalized token issued for `number`.
+    """
+    claims = _decode(token, "finalized")
+    if claims.get("sub") != number:
+        raise HTTPException(status_code=400, detail="Upload token is for another number.")
+    return claims["key"]
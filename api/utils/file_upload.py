@@ -1,87 +1,222 @@
-from datetime import date, timedelta, datetime
-from botocore.exceptions import ClientError
-from sqlalchemy.orm import Session
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from api.utils.storage import get_storage
+from fastapi import HTTPException
 from PIL import Image, ImageOps
 from dotenv import load_dotenv
+from functools import partial
 from io import BytesIO
-import boto3, os, uuid
+import asyncio, os, threading, uuid
 
 load_dotenv(".env")
 
-s3_client = boto3.client(
-    "s3",
-    region_name=os.getenv("AWS_REGION"),
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-)
-
-BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
-
 MAX_PRESIGNED_EXPIRATION = 604_800  # 7 days
 DEFAULT_EXPIRATION = min(
     int(os.getenv("PRESIGNED_URL_EXPIRATION", 600)), MAX_PRESIGNED_EXPIRATION
 )
 
+# Uploads are read in chunks and refused once past MAX_UPLOAD_BYTES; images
+# whose header claims more than MAX_IMAGE_PIXELS are refused before decoding
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 15 * 1024 * 1024))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 50_000_000))
+UPLOAD_READ_CHUNK = 1024 * 1024
 
-def refresh_presigned_url_if_expired(user_record, db: Session) -> str:
-    if date.today() - user_record.date_presigned_url_generated > timedelta(days=7):
-        user_record.date_presigned_url_generated = datetime.utcnow()
-        db.add(user_record)
-        db.commit()
-        db.refresh(user_record)
+# Pillow's own bomb check warns at this and raises at twice it
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+
+class ImageRejected(ValueError):
+    """The upload is too large or isn't an image we can decode."""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+    def __reduce__(self):
+        # Keeps status_code when raised inside the image process pool
+        return type(self), (self.detail, self.status_code)
+
+
+# Image decoding/encoding is CPU bound and S3 calls block, so neither may run
+# on the event loop. Pools are created lazily so every uvicorn worker gets its
+# own after forking.
+IMAGE_PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", 2))
+S3_IO_WORKERS = int(os.getenv("S3_IO_WORKERS", 8))
+
+_image_pool: ProcessPoolExecutor | None = None
+_s3_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_pending = {"image": 0, "s3": 0}
+
+
+def get_image_pool() -> ProcessPoolExecutor:
+    global _image_pool
+    with _pool_lock:
+        if _image_pool is None:
+            _image_pool = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS)
+        return _image_pool
+
+
+def get_s3_pool() -> ThreadPoolExecutor:
+    global _s3_pool
+    with _pool_lock:
+        if _s3_pool is None:
+            _s3_pool = ThreadPoolExecutor(
+                max_workers=S3_IO_WORKERS, thread_name_prefix="s3-io"
+            )
+        return _s3_pool
+
+
+async def _run_in_pool(kind: str, pool, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    with _pool_lock:
+        _pending[kind] += 1
+    try:
+        return await loop.run_in_executor(pool, partial(func, *args, **kwargs))
+    finally:
+        with _pool_lock:
+            _pending[kind] -= 1
+
+
+async def run_image_job(func, *args, **kwargs):
+    return await _run_in_pool("image", get_image_pool(), func, *args, **kwargs)
+
+
+async def run_s3_job(func, *args, **kwargs):
+    return await _run_in_pool("s3", get_s3_pool(), func, *args, **kwargs)
+
+
+def image_pipeline_stats() -> dict:
+    """
+    Queue depth (submitted but not yet finished jobs) for each pool.
+    """
+    with _pool_lock:
+        return {
+            "image_jobs_pending": _pending["image"],
+            "image_workers": IMAGE_PROCESS_WORKERS,
+            "s3_jobs_pending": _pending["s3"],
+            "s3_workers": S3_IO_WORKERS,
+        }
 
-        return create_download_presigned_url(
-            user_record.object_key, MAX_PRESIGNED_EXPIRATION
-        )
 
-    return user_record.profile_picture_url
+def shutdown_image_pools() -> None:
+    global _image_pool, _s3_pool
+    with _pool_lock:
+        if _image_pool is not None:
+            _image_pool.shutdown(wait=True, cancel_futures=True)
+            _image_pool = None
+        if _s3_pool is not None:
+            _s3_pool.shutdown(wait=True)
+            _s3_pool = None
 
 
+# The helpers below keep their S3-era names but go through whichever
+# StorageBackend STORAGE_BACKEND selects
 def create_download_presigned_url(
     object_key: str, expiration: int = DEFAULT_EXPIRATION
 ) -> str:
     expiration = min(expiration, MAX_PRESIGNED_EXPIRATION)
+    return get_storage().url(object_key, expiration)
+
+
+def upload_to_s3(file_bytes: bytes, object_key: str, content_type: str) -> str:
+    get_storage().put(object_key, file_bytes, content_type)
+    return create_download_presigned_url(object_key)
+
+
+def create_upload_presigned_post(
+    object_key: str, content_type: str, max_bytes: int, expiration: int
+) -> dict:
+    """
+    Presigned POST letting a browser upload straight to `object_key`, with
+    S3 itself enforcing the content type and size.
+    """
+    return get_storage().presigned_post(object_key, content_type, max_bytes, expiration)
+
+
+def head_s3_object(object_key: str) -> dict | None:
+    """
+    The object's metadata, or None if it doesn't exist.
+    """
+    return get_storage().head(object_key)
+
+
+def download_from_s3(object_key: str) -> bytes:
+    return get_storage().get(object_key)
+
+
+def delete_from_s3(object_key: str) -> None:
+    get_storage().delete(object_key)
+
+
+async def read_upload(file, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Reads an UploadFile in chunks, giving up as soon as it passes max_bytes
+    instead of pulling an arbitrarily large body into memory.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise ImageRejected(f"Image exceeds {max_bytes // (1024 * 1024)} MB.", 413)
+
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_READ_CHUNK):
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise ImageRejected(f"Image exceeds {max_bytes // (1024 * 1024)} MB.", 413)
+    return bytes(buffer)
 
+
+def open_image(file_bytes: bytes, max_pixels: int = MAX_IMAGE_PIXELS) -> Image.Image:
+    """
+    Opens an image from its header only; nothing is decoded until the
+    dimensions have been checked.
+    """
     try:
-        return s3_client.generate_presigned_url(
-            ClientMethod="get_object",
-            Params={
-                "Bucket": BUCKET_NAME,
-                "Key": object_key,
-            },
-            ExpiresIn=expiration,
-        )
-    except ClientError as e:
-        raise RuntimeError(f"S3 download URL generation failed: {e}")
+        image = Image.open(BytesIO(file_bytes))
+    except Image.DecompressionBombError:
+        raise ImageRejected(f"Image is over the {max_pixels} pixel limit.")
+    except (OSError, SyntaxError):
+        raise ImageRejected("File is not a supported image.")
 
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageRejected(f"Image is {width}x{height}, over the {max_pixels} pixel limit.")
+    return image
 
-def upload_to_s3(file_bytes: bytes, object_key: str, content_type: str) -> str:
+
+def load_image(
+    file_bytes: bytes, target_size: tuple[int, int], draft: bool = True
+) -> Image.Image:
+    """
+    Decodes an upload to an upright RGB image at least target_size large.
+
+    Raises:
+        ImageRejected: The bytes aren't an image or are too many pixels.
+    """
+    image = open_image(file_bytes)
+    if draft:
+        # Only JPEG implements this; both sides stay >= target_size, so
+        # rotating for EXIF below can't leave it too small
+        image.draft("RGB", target_size)
     try:
-        s3_client.put_object(
-            Bucket=BUCKET_NAME,
-            Key=object_key,
-            Body=file_bytes,
-            ContentType=content_type,
-            CacheControl="public, max-age=604800",
-        )
-    except ClientError as e:
-        raise RuntimeError(f"S3 upload failed: {e}")
+        image = ImageOps.exif_transpose(image)  # Correct orientation
+        return image.convert("RGB")  # Ensure RGB format
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ImageRejected("File is not a supported image.")
 
-    return create_download_presigned_url(object_key)
 
+def encode_image(image: Image.Image, output_format: str, quality: int) -> tuple[bytes, str]:
+    output_buffer = BytesIO()
+    image.save(output_buffer, format=output_format, quality=quality, optimize=True)
+    return output_buffer.getvalue(), f"image/{output_format.lower()}"
 
-def delete_from_s3(object_key: str) -> None:
-    s3_client.delete_object(
-        Bucket=BUCKET_NAME,
-        Key=object_key,
-    )
 
 # Image Preprocessing function to resize images before upload
 def clean_image(file_bytes: bytes, 
                 target_size: tuple[int, int] = (512, 512), 
                 crop: bool = True,
                 output_format: str = "JPEG",
-                quality: int=95
+                quality: int=95,
+                draft: bool = True,
                 ) -> tuple[bytes, str]:
 
     """
@@ -93,15 +228,17 @@ def clean_image(file_bytes: bytes,
         crop (bool): Whether to center-crop after resize.
         output_format (str): Output format ('JPEG' or 'PNG').
         quality (int): Compression quality (1–95 for JPEG).
+        draft (bool): Let JPEGs decode at a reduced DCT scale that still
+            covers target_size, rather than at full resolution.
 
     Returns:
         Tuple[bytes, str]: Processed image bytes and content type.
+
+    Raises:
+        ImageRejected: The bytes aren't an image or are too many pixels.
     """
 
-    # Load the image safely
-    image = Image.open(BytesIO(file_bytes))
-    image = ImageOps.exif_transpose(image)  # Correct orientation
-    image = image.convert("RGB")  # Ensure RGB format
+    image = load_image(file_bytes, target_size, draft)
 
     if crop:
         image = ImageOps.fit(
@@ -112,39 +249,101 @@ def clean_image(file_bytes: bytes,
     else:
         image.thumbnail(target_size, Image.Resampling.LANCZOS)
 
-    # Re-encode the image
-    output_buffer = BytesIO()
-    image.save(
-        output_buffer,
-        format=output_format,
-        quality=quality,
-        optimize=True
+    return encode_image(image, output_format, quality)
+
+
+# Smaller square WebP copies of every profile picture, stored next to the
+# 512px JPEG master: name -> (edge in px, quality)
+RENDITIONS = {
+    "thumb": (64, 80),
+    "card": (160, 80),
+}
+
+
+def rendition_key(object_key: str, rendition: str) -> str:
+    """
+    users/0801/ade_1f2e.jpg -> users/0801/ade_1f2e.thumb.webp
+    """
+    return f"{object_key.rsplit('.', 1)[0]}.{rendition}.webp"
+
+
+def profile_picture_keys(object_key: str) -> list[str]:
+    return [object_key] + [rendition_key(object_key, name) for name in RENDITIONS]
+
+
+def render_profile_picture(
+    file_bytes: bytes, master_size: int = 512, quality: int = 95, draft: bool = True
+) -> dict[str, tuple[bytes, str]]:
+    """
+    The cropped JPEG master ("master") and every entry of RENDITIONS from a
+    single decode; the renditions are downscaled from the master.
+    """
+    image = load_image(file_bytes, (master_size, master_size), draft)
+    master = ImageOps.fit(
+        image, (master_size, master_size),
+        method=Image.Resampling.LANCZOS,
+        centering=(0.5, 0.5),
     )
 
-    content_type = f"image/{output_format.lower()}"
-    return output_buffer.getvalue(), content_type
+    rendered = {"master": encode_image(master, "JPEG", quality)}
+    for name, (edge, rendition_quality) in RENDITIONS.items():
+        small = master.resize((edge, edge), Image.Resampling.LANCZOS)
+        rendered[name] = encode_image(small, "WEBP", rendition_quality)
+    return rendered
 
 
-async def process_and_upload_image(
-    file, first_name: str, number: str
-) -> tuple[str, str]:
-    ext = file.filename.rsplit(".", 1)[-1]
+async def upload_profile_picture(
+    rendered: dict[str, tuple[bytes, str]], object_key: str
+) -> str:
+    """
+    Uploads the output of render_profile_picture concurrently and returns
+    the master's URL.
+    """
+    keys = {name: rendition_key(object_key, name) for name in RENDITIONS}
+    keys["master"] = object_key
+
+    urls = await asyncio.gather(
+        *(
+            run_s3_job(
+                upload_to_s3,
+                file_bytes=file_bytes,
+                object_key=keys[name],
+                content_type=content_type,
+            )
+            for name, (file_bytes, content_type) in rendered.items()
+        )
+    )
+    return urls[list(rendered).index("master")]
+
+
+def delete_profile_picture(object_key: str) -> None:
+    """
+    Removes the master and its renditions in one request.
+    """
+    get_storage().delete_many(profile_picture_keys(object_key))
+
+
+def build_user_object_key(first_name: str, number: str, ext: str = "jpg") -> str:
     safe_name = first_name.lower().replace(" ", "_")
     unique_name = f"{safe_name}_{uuid.uuid4().hex}.{ext}"
+    return f"users/{number}/{unique_name}"
 
-    object_key = f"users/{number}/{unique_name}"
-    raw_bytes = await file.read()
 
-    processed_bytes, content_type = clean_image(
-        file_bytes=raw_bytes,
-        target_size=(512, 512),
-        crop=True,
-    )
+async def process_and_upload_image(
+    file, first_name: str, number: str, object_key: str | None = None
+) -> tuple[str, str]:
+    # object_key is passed when the key was reserved up front, e.g. for
+    # batch registrations whose photos are uploaded afterwards
+    if object_key is None:
+        ext = file.filename.rsplit(".", 1)[-1]
+        object_key = build_user_object_key(first_name, number, ext)
 
-    image_url = upload_to_s3(
-        file_bytes=processed_bytes,
-        object_key=object_key,
-        content_type=content_type,
-    )
+    try:
+        raw_bytes = await read_upload(file)
+        rendered = await run_image_job(render_profile_picture, file_bytes=raw_bytes)
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    image_url = await upload_profile_picture(rendered, object_key)
 
     return image_url, object_key
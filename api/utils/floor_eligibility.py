@@ -0,0 +1,109 @@
+from api.v1.models.floor import HallFloors, floor_category_association
+from api.v1.models.category import Category
+from api.v1.models.hall import Hall
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from collections import defaultdict
+from typing import Optional
+import logging, os, threading, time, uuid
+
+load_dotenv(".env")
+
+logger = logging.getLogger(__name__)
+
+# Floor setup changes through this worker rebuild the index straight away;
+# changes made through another worker are picked up once it is this old
+FLOOR_ELIGIBILITY_MAX_AGE = float(os.getenv("FLOOR_ELIGIBILITY_MAX_AGE", 30))
+
+# Open to registrants of every gender
+SHARED_HALL_NAME = "Jerusalem Hall"
+
+
+def build_eligibility(db: Session) -> dict[tuple[str, str, str], list[uuid.UUID]]:
+    """
+    Maps (gender, category_name, age_range) to the floors a registrant with
+    those attributes may be placed on, in allocation order (hall id, then
+    floor number). Two queries, whatever the number of halls.
+    """
+    floors = (
+        db.query(
+            HallFloors.floor_id,
+            HallFloors.age_ranges,
+            Hall.gender,
+            Hall.hall_name,
+        )
+        .join(Hall, Hall.id == HallFloors.hall_id)
+        .order_by(Hall.id, HallFloors.floor_no)
+        .all()
+    )
+    genders = {"male", "female"} | {gender for _, _, gender, _ in floors}
+
+    categories = defaultdict(list)
+    for floor_id, category_name in (
+        db.query(floor_category_association.c.floor_id, Category.category_name)
+        .join(Category, Category.id == floor_category_association.c.category_id)
+    ):
+        categories[floor_id].append(category_name)
+
+    index = defaultdict(list)
+    for floor_id, age_ranges, gender, hall_name in floors:
+        floor_genders = genders if hall_name == SHARED_HALL_NAME else {gender}
+        for floor_gender in floor_genders:
+            for category_name in categories.get(floor_id, ()):
+                for age_range in dict.fromkeys(age_ranges or ()):
+                    index[(floor_gender, category_name, age_range)].append(floor_id)
+    return dict(index)
+
+
+class FloorEligibilityIndex:
+    """
+    The floors each kind of registrant is eligible for, so allocation only
+    has to check which of them still have space.
+
+    Built on first use, rebuilt by the routes that change a floor's
+    categories or age ranges, and dropped when halls or categories change.
+    Fill state ("not-full", free beds) is never cached here.
+    """
+
+    def __init__(self, max_age: float = FLOOR_ELIGIBILITY_MAX_AGE):
+        self.max_age = max_age
+        self.index: Optional[dict] = None
+        self.built_at = 0.0
+        self.lock = threading.Lock()
+        self.builds = 0
+
+    def rebuild(self, db: Session) -> dict:
+        index = build_eligibility(db)
+        with self.lock:
+            self.index = index
+            self.built_at = time.monotonic()
+            self.builds += 1
+        return index
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.index = None
+
+    def candidates(
+        self, db: Session, gender: str, category: str, age_range: str
+    ) -> list[uuid.UUID]:
+        with self.lock:
+            index = self.index
+            fresh = time.monotonic() - self.built_at < self.max_age
+        if index is None or not fresh:
+            index = self.rebuild(db)
+        return index.get((gender, category, age_range), [])
+
+    def stats(self) -> dict:
+        with self.lock:
+            index = self.index or {}
+            return {
+                "built": self.index is not None,
+                "age_seconds": round(time.monotonic() - self.built_at, 1) if self.index is not None else None,
+                "keys": len(index),
+                "floors": len({floor_id for floors in index.values() for floor_id in floors}),
+                "builds": self.builds,
+            }
+
+
+floor_eligibility = FloorEligibilityIndex()
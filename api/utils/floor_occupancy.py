@@ -0,0 +1,164 @@
+from api.v1.models.floor import HallFloors
+from api.v1.models.hall import Hall
+from api.v1.models.user import User
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def adjust_floor_occupancy(
+    db: Session, floor_id, all_delta: int = 0, active_delta: int = 0
+) -> None:
+    """
+    Applies a relative change to a floor's occupancy counters.
+
+    Runs as a single `SET x = x + delta` UPDATE inside the caller's
+    transaction, so concurrent registrations never overwrite each other and
+    a rollback undoes the change together with the user row.
+    """
+    if not floor_id or (all_delta == 0 and active_delta == 0):
+        return
+
+    db.query(HallFloors).filter(HallFloors.floor_id == floor_id).update(
+        {
+            HallFloors.all_users_count: HallFloors.all_users_count + all_delta,
+            HallFloors.active_users_count: HallFloors.active_users_count + active_delta,
+        },
+        synchronize_session=False,
+    )
+
+
+def track_user_added(db: Session, floor_id, active_status: str | None) -> None:
+    adjust_floor_occupancy(db, floor_id, 1, 1 if active_status == "active" else 0)
+
+
+def track_user_removed(db: Session, user: User) -> None:
+    adjust_floor_occupancy(
+        db, user.floor, -1, -1 if user.active_status == "active" else 0
+    )
+
+
+def hall_occupancy(db: Session, hall_name: Optional[str] = None) -> list[dict]:
+    """
+    Bed and occupancy figures for every hall (or the one named, matched
+    case-insensitively) and each of its floors.
+
+    One statement whatever the number of halls: halls left-joined to their
+    floors' occupancy counters, so a hall without floors is still listed.
+    """
+    query = (
+        db.query(
+            Hall.id,
+            Hall.hall_name,
+            Hall.no_floors,
+            HallFloors.floor_no,
+            HallFloors.no_beds,
+            HallFloors.all_users_count,
+            HallFloors.active_users_count,
+        )
+        .outerjoin(HallFloors, HallFloors.hall_id == Hall.id)
+        .order_by(Hall.id, HallFloors.floor_no)
+    )
+    if hall_name is not None:
+        query = query.filter(func.lower(Hall.hall_name) == hall_name.lower())
+
+    halls = {}
+    for hall_id, name, no_floors, floor_no, no_beds, all_users, active_users in query:
+        hall = halls.get(hall_id)
+        if hall is None:
+            hall = halls[hall_id] = {
+                "hall_name": name,
+                "no_floors": no_floors,
+                "total_beds": 0,
+                "current_user_count": 0,
+                "verified_user_count": 0,
+                "remaining_space": 0,
+                "floors": [],
+            }
+        if floor_no is None:
+            continue
+
+        # Every bunk holds two
+        hall["total_beds"] += (no_beds or 0) * 2
+        hall["current_user_count"] += all_users
+        hall["verified_user_count"] += active_users
+        hall["floors"].append(
+            {
+                "floor_no": f"Floor {floor_no}",
+                "no_beds": no_beds,
+                "active_users_count": active_users,
+                "all_users_count": all_users,
+            }
+        )
+
+    for hall in halls.values():
+        hall["remaining_space"] = hall["total_beds"] - hall["current_user_count"]
+    return list(halls.values())
+
+
+def reconcile_floor_occupancy(db: Session, dry_run: bool = True) -> list[dict]:
+    """
+    Recomputes every floor's counters from `users` and reports any drift.
+
+    With dry_run=False the stored counters are corrected to the recomputed
+    values in the same pass.
+    """
+    actual = (
+        db.query(
+            User.floor.label("floor_id"),
+            func.count(User.id).label("all_users_count"),
+            func.count(case((User.active_status == "active", 1))).label(
+                "active_users_count"
+            ),
+        )
+        .filter(User.floor.isnot(None))
+        .group_by(User.floor)
+        .subquery()
+    )
+
+    rows = (
+        db.query(
+            HallFloors,
+            func.coalesce(actual.c.all_users_count, 0),
+            func.coalesce(actual.c.active_users_count, 0),
+        )
+        .outerjoin(actual, actual.c.floor_id == HallFloors.floor_id)
+        .with_for_update(of=HallFloors)
+        .all()
+    )
+
+    drift = []
+    for floor, all_users_count, active_users_count in rows:
+        if (
+            floor.all_users_count == all_users_count
+            and floor.active_users_count == active_users_count
+        ):
+            continue
+
+        drift.append(
+            {
+                "floor_id": floor.floor_id,
+                "hall_id": floor.hall_id,
+                "floor_no": floor.floor_no,
+                "stored_all_users_count": floor.all_users_count,
+                "actual_all_users_count": all_users_count,
+                "stored_active_users_count": floor.active_users_count,
+                "actual_active_users_count": active_users_count,
+            }
+        )
+        if not dry_run:
+            floor.all_users_count = all_users_count
+            floor.active_users_count = active_users_count
+
+    if drift:
+        logger.warning("Floor occupancy drift detected on %d floor(s)", len(drift))
+
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+
+    return drift
@@ -0,0 +1,120 @@
+from api.utils.presigned_urls import PRESIGNED_URL_MIN_REMAINING
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Request
+import hashlib, os, threading, time
+
+GALLERY_CACHE_SIZE = int(os.getenv("GALLERY_CACHE_SIZE", 2000))
+
+# A 304 keeps the client on its copy of the signed image URLs, so validators
+# also roll over every PRESIGNED_URL_MIN_REMAINING seconds: the least time a
+# served URL has left. A copy revalidated within its window is still usable.
+VALIDATOR_WINDOW = max(PRESIGNED_URL_MIN_REMAINING, 1)
+
+
+class GalleryCache:
+    """
+    Pages of a category's images keyed by (category_id, after_id, limit).
+
+    Each entry remembers the category's updated_at it was read under and is
+    dropped when that no longer matches, so an image added through another
+    worker is picked up on the next read. Writes through this worker also
+    invalidate the category straight away.
+    """
+
+    def __init__(self, max_entries: int = GALLERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.pages: OrderedDict[tuple, tuple] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, stamp: datetime) -> Optional[tuple[list, Optional[int]]]:
+        with self.lock:
+            entry = self.pages.get(key)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+            self.pages.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key: tuple, stamp: datetime, rows: list, next_after: Optional[int]) -> None:
+        with self.lock:
+            self.pages[key] = (stamp, rows, next_after)
+            self.pages.move_to_end(key)
+            while len(self.pages) > self.max_entries:
+                self.pages.popitem(last=False)
+
+    def invalidate(self, category_id: int) -> None:
+        with self.lock:
+            for key in [key for key in self.pages if key[0] == category_id]:
+                del self.pages[key]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "pages": len(self.pages),
+                "max_pages": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+gallery_cache = GalleryCache()
+
+
+def gallery_validators(stamp: datetime, *parts) -> tuple[str, Optional[datetime]]:
+    """
+    A weak ETag and a Last-Modified for a response built from data last
+    changed at `stamp`. Weak because signed URLs differ byte for byte
+    between workers even when they point at the same objects.
+    """
+    now = time.time()
+    window = int(now // VALIDATOR_WINDOW)
+    digest = hashlib.sha1(repr((stamp.isoformat(), window, *parts)).encode()).hexdigest()
+    etag = f'W/"{digest[:32]}"'
+
+    # HTTP dates have whole seconds, so a second change within the same
+    # second would carry the same date. Until that second is over, only the
+    # ETag is sent.
+    changed = stamp.replace(microsecond=0) + timedelta(seconds=1)
+    if changed.timestamp() > now:
+        return etag, None
+    window_start = datetime.fromtimestamp(window * VALIDATOR_WINDOW, timezone.utc)
+    return etag, max(changed, window_start)
+
+
+def body_etag(*parts) -> str:
+    return f'"{hashlib.sha1(repr(parts).encode()).hexdigest()[:32]}"'
+
+
+def not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime] = None
+) -> bool:
+    """
+    Whether the client's copy is current. If-None-Match wins over
+    If-Modified-Since when both are sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    # no-cache: clients may store the response but must revalidate each use
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
@@ -1,5 +1,7 @@
+from api.v1.models.sms_outbox import SmsOutbox
+from sqlalchemy.orm import Session
 from dotenv import load_dotenv
-import requests, os, httpx
+import os
 
 load_dotenv(".env")
 
@@ -7,13 +9,11 @@ load_dotenv(".env")
 base_url = os.getenv("TERMI_BASE_URL")
 termi_api_key= os.getenv("TERMI_API_KEY")
 from_client = os.getenv("TERMI_FROM_CLIENT")
+# Overridable so the dispatcher can be pointed at a local fake Termii server
+termi_send_url = os.getenv("TERMI_SEND_URL", f"https://{base_url}/api/sms/send")
 
 
-def send_sms_termii(phone_number: str, name: str, arrival_date: str, hall: str, floor: str, bed_no: str, country: str):
-    """
-    Asynchronously sends an SMS via the Termii API.
-    """
-
+def normalize_phone_number(phone_number: str, country: str) -> str:
     # Normalize phone number based on country
     country = country.lower()
     if phone_number.startswith("0"):
@@ -23,16 +23,11 @@ def send_sms_termii(phone_number: str, name: str, arrival_date: str, hall: str,
             phone_number = "233" + phone_number[1:]
         elif country == "kenya":
             phone_number = "254" + phone_number[1:]
+    return phone_number
 
-    sms_content = (
-        f"Good day {name}! You have been successfully registered for the camp meeting.\n"
-        f"Hall: {hall}\n"
-        f"Floor: Floor {floor}\n"
-        f"Bed No: {bed_no}\n\n"
-        f"Please ensure to arrive on the registered date. Thank you and God bless you."
-    )
 
-    payload = {
+def build_termii_payload(phone_number: str, sms_content: str) -> dict:
+    return {
         "to": phone_number,
         "from": f"{from_client}",
         "sms": sms_content,
@@ -40,51 +35,49 @@ def send_sms_termii(phone_number: str, name: str, arrival_date: str, hall: str,
         "channel": "generic",
         "api_key": termi_api_key,
     }
-    url = f"https://{base_url}/api/sms/send"
 
-    headers = {
-        "Content-Type": "application/json",
-    }
 
-    response = requests.request("POST", url, headers=headers, json=payload)
+def queue_sms(db: Session, phone_number: str, country: str, sms_content: str) -> SmsOutbox:
+    """
+    Adds an SMS to the outbox without committing.
 
-    return response.json()
+    Callers add it in the same transaction as the registration it confirms;
+    the background dispatcher delivers it once that transaction commits.
+    """
+    message = SmsOutbox(
+        phone_number=normalize_phone_number(phone_number, country),
+        message=sms_content,
+        status="pending",
+        attempts=0,
+    )
+    db.add(message)
+    return message
 
 
-def send_sms_termii_attendance_only(phone_number: str, name: str, arrival_date: str, country: str):
+def queue_sms_termii(db: Session, phone_number: str, name: str, arrival_date: str, hall: str, floor: str, bed_no: str, country: str):
     """
-    Asynchronously sends an SMS via the Termii API for attendance-only registration.
+    Queues the registration confirmation SMS.
     """
 
-    # Normalize phone number based on country
-    country = country.lower()
-    if phone_number.startswith("0"):
-        if country == "nigeria":
-            phone_number = "234" + phone_number[1:]
-        elif country == "ghana":
-            phone_number = "233" + phone_number[1:]
-        elif country == "kenya":
-            phone_number = "254" + phone_number[1:]
-
     sms_content = (
-        f"Good day {name}! You have been successfully registered for the camp meeting for attendance only.\n"
+        f"Good day {name}! You have been successfully registered for the camp meeting.\n"
+        f"Hall: {hall}\n"
+        f"Floor: Floor {floor}\n"
+        f"Bed No: {bed_no}\n\n"
         f"Please ensure to arrive on the registered date. Thank you and God bless you."
     )
 
-    payload = {
-        "to": phone_number,
-        "from": f"{from_client}",
-        "sms": sms_content,
-        "type": "plain",
-        "channel": "generic",
-        "api_key": termi_api_key,
-    }
-    url = f"https://{base_url}/api/sms/send"
+    return queue_sms(db, phone_number, country, sms_content)
 
-    headers = {
-        "Content-Type": "application/json",
-    }
 
-    response = requests.request("POST", url, headers=headers, json=payload)
+def queue_sms_termii_attendance_only(db: Session, phone_number: str, name: str, arrival_date: str, country: str):
+    """
+    Queues the confirmation SMS for attendance-only registration.
+    """
+
+    sms_content = (
+        f"Good day {name}! You have been successfully registered for the camp meeting for attendance only.\n"
+        f"Please ensure to arrive on the registered date. Thank you and God bless you."
+    )
 
-    return response.json()
+    return queue_sms(db, phone_number, country, sms_content)
@@ -0,0 +1,135 @@
+"""
+Deletes stored objects that no user, minister or gallery image refers to,
+e.g. pictures left behind by a registration that failed after its upload or
+by a user row that was deleted and re-created.
+
+    python -m api.utils.orphan_gc --dry-run
+    python -m api.utils.orphan_gc --min-age-hours 24
+
+Objects younger than --min-age-hours are never touched, so uploads whose
+registration hasn't committed yet (including direct uploads waiting on
+register-user) are safe.
+"""
+from api.utils.file_upload import profile_picture_keys
+from api.utils.storage import StorageBackend, StorageError, get_storage
+from datetime import datetime, timedelta, timezone
+from api.v1.models.minister import Minister
+from api.v1.models.images import Image
+from api.db.database import SessionLocal
+from api.v1.models.user import User
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+import argparse, logging
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 1000  # the most delete_objects accepts per request
+
+
+def referenced_keys(db: Session) -> set[str]:
+    """
+    Every key the database points at, including profile picture renditions.
+    """
+    keys: set[str] = set()
+    for model in (User, Minister):
+        query = select(model.object_key).where(model.object_key.isnot(None))
+        for object_key in db.scalars(query.execution_options(yield_per=5000)):
+            keys.update(profile_picture_keys(object_key))
+
+    query = select(Image.object_key).where(Image.object_key.isnot(None))
+    keys.update(db.scalars(query.execution_options(yield_per=5000)))
+
+    # Gallery keys are stored with a leading "/"; the local backend lists
+    # them without it. Keeping both forms errs towards not deleting.
+    keys.update([key.lstrip("/") for key in keys if key.startswith("/")])
+    return keys
+
+
+def find_orphans(
+    storage: StorageBackend, referenced: set[str], min_age: timedelta, prefix: str = ""
+) -> dict:
+    cutoff = datetime.now(timezone.utc) - min_age
+    listed, recent, sizes = set(), 0, {}
+    for stored in storage.list_objects(prefix):
+        if stored.last_modified > cutoff:
+            recent += 1
+            continue
+        listed.add(stored.key)
+        sizes[stored.key] = stored.size
+
+    orphans = sorted(listed - referenced)
+    return {
+        "listed": len(listed) + recent,
+        "too_recent": recent,
+        "referenced": len(listed & referenced),
+        "orphans": orphans,
+        "orphan_bytes": sum(sizes[key] for key in orphans),
+    }
+
+
+def delete_orphans(storage: StorageBackend, orphans: list[str]) -> tuple[int, list[str]]:
+    deleted, failed = 0, []
+    for start in range(0, len(orphans), DELETE_BATCH_SIZE):
+        batch = orphans[start : start + DELETE_BATCH_SIZE]
+        try:
+            storage.delete_many(batch)
+            deleted += len(batch)
+        except StorageError as e:
+            logger.warning("Deleting a batch of %d failed: %s", len(batch), e)
+            failed.extend(batch)
+    return deleted, failed
+
+
+def collect_orphans(
+    dry_run: bool = True,
+    min_age: timedelta = timedelta(hours=24),
+    prefix: str = "",
+    storage: StorageBackend | None = None,
+) -> dict:
+    storage = storage or get_storage()
+    # Read the database before listing: anything committed after this read
+    # was uploaded after it too, so it falls inside min_age and is skipped
+    db = SessionLocal()
+    try:
+        referenced = referenced_keys(db)
+    finally:
+        db.close()
+
+    report = find_orphans(storage, referenced, min_age, prefix)
+    report["deleted"], report["failed"] = 0, []
+    if not dry_run:
+        report["deleted"], report["failed"] = delete_orphans(storage, report["orphans"])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--min-age-hours", type=float, default=24)
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--list", action="store_true", help="print every orphaned key")
+    args = parser.parse_args()
+
+    report = collect_orphans(
+        dry_run=args.dry_run,
+        min_age=timedelta(hours=args.min_age_hours),
+        prefix=args.prefix,
+    )
+
+    if args.list:
+        for key in report["orphans"]:
+            print(key)
+    print(
+        f"{report['listed']} objects listed, {report['too_recent']} too recent, "
+        f"{report['referenced']} referenced, {len(report['orphans'])} orphaned "
+        f"({report['orphan_bytes'] / 1e6:.1f} MB)"
+    )
+    if args.dry_run:
+        print("Dry run: nothing deleted.")
+    else:
+        print(f"{report['deleted']} deleted, {len(report['failed'])} failed")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,161 @@
+from api.utils.file_upload import MAX_PRESIGNED_EXPIRATION, rendition_key
+from api.utils.storage import get_storage
+from collections import OrderedDict
+from typing import Iterable, Optional
+from dotenv import load_dotenv
+import logging, os, threading, time
+
+load_dotenv(".env")
+
+logger = logging.getLogger(__name__)
+
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", 50_000))
+# Cached URLs are signed for this long...
+PRESIGNED_URL_CACHE_EXPIRATION = min(
+    int(os.getenv("PRESIGNED_URL_CACHE_EXPIRATION", 3600)), MAX_PRESIGNED_EXPIRATION
+)
+# ...and re-signed once less than this is left, so a client never receives
+# a URL that is about to stop working
+PRESIGNED_URL_MIN_REMAINING = min(
+    int(os.getenv("PRESIGNED_URL_MIN_REMAINING", 600)), PRESIGNED_URL_CACHE_EXPIRATION // 2
+)
+
+
+def sign_object_urls(object_keys: Iterable[str], expiration: int) -> dict[str, str]:
+    """
+    Download URLs for many keys at once from the configured storage backend.
+    """
+    return get_storage().sign_urls(object_keys, expiration)
+
+
+class PresignedUrlCache:
+    """
+    Presigned download URLs keyed by object_key.
+
+    Entries are reused until they get within `min_remaining` seconds of
+    expiry; past `max_entries` the ones too old to hand out go first, then
+    the least recently used. Nothing here touches the database.
+    """
+
+    def __init__(
+        self,
+        signer=sign_object_urls,
+        max_entries: int = PRESIGNED_URL_CACHE_SIZE,
+        expiration: int = PRESIGNED_URL_CACHE_EXPIRATION,
+        min_remaining: int = PRESIGNED_URL_MIN_REMAINING,
+    ):
+        self.signer = signer
+        self.max_entries = max_entries
+        self.expiration = expiration
+        self.min_remaining = min_remaining
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, object_keys: Iterable[str]) -> dict[str, str]:
+        """
+        URLs for every key, signing all the misses in one batch.
+        """
+        now = time.time()
+        urls, missing = {}, []
+        with self.lock:
+            for object_key in dict.fromkeys(object_keys):
+                entry = self.entries.get(object_key)
+                if entry is not None and entry[1] - now >= self.min_remaining:
+                    self.entries.move_to_end(object_key)
+                    urls[object_key] = entry[0]
+                else:
+                    missing.append(object_key)
+            self.hits += len(urls)
+            self.misses += len(missing)
+
+        if missing:
+            signed_at = time.time()
+            signed = self.signer(missing, self.expiration)
+            with self.lock:
+                for object_key, url in signed.items():
+                    self.entries[object_key] = (url, signed_at + self.expiration)
+                    self.entries.move_to_end(object_key)
+                self.evict(signed_at)
+            urls.update(signed)
+
+        return urls
+
+    def evict(self, now: float) -> None:
+        if len(self.entries) <= self.max_entries:
+            return
+
+        stale = [
+            object_key
+            for object_key, (_, expires_at) in self.entries.items()
+            if expires_at - now < self.min_remaining
+        ]
+        for object_key in stale:
+            del self.entries[object_key]
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.evictions += len(stale)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expiration_seconds": self.expiration,
+            }
+
+
+presigned_url_cache = PresignedUrlCache()
+
+
+# profile_picture_url's column default on users and ministers, left in place
+# while no picture has been uploaded (e.g. batch registrations)
+PICTURE_PLACEHOLDER = "getalife"
+
+
+def signed_urls_for(
+    records, key_attr: str = "object_key", rendition: Optional[str] = None
+) -> dict[str, str]:
+    """
+    Batch-signs the objects behind `records`, skipping those without a key.
+    Callers fall back to the stored URL for anything missing from the result.
+
+    With a rendition (see file_upload.RENDITIONS) the URLs point at that copy
+    of each picture, still keyed by the record's own object_key. Only records
+    whose renditions_at is set get one; the rest get their master, or nothing
+    when no picture was uploaded yet (a reserved key from batch registration).
+    """
+    targets = {}
+    for record in records:
+        key = getattr(record, key_attr)
+        if not key:
+            continue
+        if rendition is None:
+            targets[key] = key
+        elif getattr(record, "renditions_at", None) is not None:
+            targets[key] = rendition_key(key, rendition)
+        elif record.profile_picture_url not in (None, PICTURE_PLACEHOLDER):
+            targets[key] = key
+    if not targets:
+        return {}
+
+    try:
+        urls = presigned_url_cache.get_many(targets.values())
+    except RuntimeError as exc:
+        logger.warning("Serving stored URLs, signing failed: %s", exc)
+        return {}
+    return {key: urls[target] for key, target in targets.items()}
+
+
+def signed_picture_url(record) -> Optional[str]:
+    """
+    A fresh URL for a user's or minister's profile picture, falling back to
+    the stored one when there is no object_key or signing fails.
+    """
+    return signed_urls_for([record]).get(record.object_key, record.profile_picture_url)
@@ -0,0 +1,99 @@
+"""
+Generates the RENDITIONS for profile pictures uploaded before they existed,
+so list views don't point at missing thumbnails.
+
+    python -m api.utils.rendition_backfill --dry-run
+    python -m api.utils.rendition_backfill --workers 8
+
+Pictures that already have every rendition are skipped, so it is safe to
+re-run. Masters are left untouched. Users and ministers whose pictures end
+up complete get renditions_at set, which switches list views over to the
+thumbnails.
+"""
+from api.utils.file_upload import (
+    RENDITIONS,
+    ImageRejected,
+    download_from_s3,
+    head_s3_object,
+    render_profile_picture,
+    rendition_key,
+    upload_to_s3,
+)
+from api.utils.direct_upload import mark_renditions_ready
+from concurrent.futures import ThreadPoolExecutor
+from api.v1.models.minister import Minister
+from api.db.database import SessionLocal
+from api.v1.models.user import User
+from sqlalchemy import select, union
+import argparse, logging
+
+logger = logging.getLogger(__name__)
+
+
+def picture_keys() -> list[str]:
+    db = SessionLocal()
+    try:
+        query = union(
+            select(User.object_key).where(User.object_key.isnot(None)),
+            select(Minister.object_key).where(Minister.object_key.isnot(None)),
+        )
+        return sorted(db.scalars(query))
+    finally:
+        db.close()
+
+
+def backfill(object_key: str, dry_run: bool) -> str:
+    missing = [
+        name for name in RENDITIONS if head_s3_object(rendition_key(object_key, name)) is None
+    ]
+    if not missing:
+        return "complete"
+    if head_s3_object(object_key) is None:
+        # e.g. a batch registration whose photo was never uploaded
+        return "no master"
+    if dry_run:
+        return "missing"
+
+    try:
+        rendered = render_profile_picture(download_from_s3(object_key))
+        for name in missing:
+            file_bytes, content_type = rendered[name]
+            upload_to_s3(file_bytes, rendition_key(object_key, name), content_type)
+    except (RuntimeError, ImageRejected) as e:
+        logger.warning("Backfilling %s failed: %s", object_key, e)
+        return "failed"
+    return "generated"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    keys = picture_keys()
+    counts: dict[str, int] = {}
+    ready = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for object_key, result in zip(
+            keys, pool.map(lambda key: backfill(key, args.dry_run), keys)
+        ):
+            counts[result] = counts.get(result, 0) + 1
+            if result == "no master":
+                logger.warning("No object for %s", object_key)
+            elif result in ("complete", "generated"):
+                ready.append(object_key)
+
+    marked = 0
+    for start in range(0, len(ready), 1000):
+        marked += mark_renditions_ready(ready[start : start + 1000])
+
+    print(
+        f"{len(keys)} pictures: " + ", ".join(f"{n} {r}" for r, n in sorted(counts.items()))
+        + f"; {marked} records marked"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,146 @@
+from api.utils.user_listing import apply_user_filters
+from api.v1.models.phone_number import PhoneNumber
+from api.v1.models.floor import HallFloors
+from api.db.database import open_read_session
+from api.v1.models.user import User
+from openpyxl import Workbook
+from datetime import date
+from io import StringIO
+import csv, json, tempfile
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+ROSTER_COLUMNS = [
+    "id",
+    "first_name",
+    "phone_number",
+    "gender",
+    "category",
+    "age_range",
+    "hall_name",
+    "floor_no",
+    "bed_number",
+    "extra_beds",
+    "active_status",
+    "arrival_date",
+    "local_assembly",
+    "state",
+    "country",
+    "medical_issues",
+]
+
+
+def iter_roster_rows(**filters):
+    """
+    Yields roster rows as tuples in ROSTER_COLUMNS order.
+
+    Rows come from a server-side cursor in batches of EXPORT_BATCH_SIZE, so
+    memory stays flat however large the roster is. The generator owns its
+    session because it outlives the request's dependencies while streaming.
+    """
+    db = open_read_session()
+    try:
+        query = (
+            db.query(
+                User.id,
+                User.first_name,
+                PhoneNumber.phone_number,
+                User.gender,
+                User.category,
+                User.age_range,
+                User.hall_name,
+                HallFloors.floor_no,
+                User.bed_number,
+                User.extra_beds,
+                User.active_status,
+                User.arrival_date,
+                User.local_assembly,
+                User.state,
+                User.country,
+                User.medical_issues,
+            )
+            .outerjoin(PhoneNumber, PhoneNumber.id == User.phone_number_id)
+            .outerjoin(HallFloors, HallFloors.floor_id == User.floor)
+        )
+        query = (
+            apply_user_filters(query, **filters)
+            .order_by(User.id)
+            .execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+        )
+        for row in query:
+            yield tuple(row)
+    finally:
+        db.close()
+
+
+def format_cell(value):
+    if isinstance(value, list):
+        return ", ".join(str(item) for item in value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(**filters):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ROSTER_COLUMNS)
+
+    for row in iter_roster_rows(**filters):
+        writer.writerow([format_cell(value) for value in row])
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def stream_ndjson(**filters):
+    lines = []
+    size = 0
+    for row in iter_roster_rows(**filters):
+        record = dict(zip(ROSTER_COLUMNS, row))
+        record["arrival_date"] = format_cell(record["arrival_date"])
+        line = json.dumps(record) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield "".join(lines)
+            lines, size = [], 0
+
+    yield "".join(lines)
+
+
+def stream_xlsx(**filters):
+    """
+    XLSX is a zip archive, so it can only be sent once complete. The
+    write-only workbook spills rows to disk as they arrive, and the finished
+    file is then streamed back in chunks.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Roster")
+    sheet.append(ROSTER_COLUMNS)
+    for row in iter_roster_rows(**filters):
+        sheet.append([format_cell(value) for value in row])
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while chunk := output.read(EXPORT_CHUNK_SIZE):
+            yield chunk
+
+
+def stream_roster(export_format: str, **filters):
+    if export_format == "csv":
+        return stream_csv(**filters)
+    if export_format == "ndjson":
+        return stream_ndjson(**filters)
+    return stream_xlsx(**filters)
@@ -0,0 +1,157 @@
+from contextvars import ContextVar
+from collections import Counter
+from dotenv import load_dotenv
+from sqlalchemy import event
+from typing import Optional
+import logging, os, re, threading, time
+
+load_dotenv(".env")
+
+logger = logging.getLogger(__name__)
+
+SQL_INSTRUMENTATION_ENABLED = os.getenv("SQL_INSTRUMENTATION_ENABLED", "True") == "True"
+# Requests issuing more statements than this get a warning in the logs
+SQL_STATEMENT_BUDGET = int(os.getenv("SQL_STATEMENT_BUDGET", 15))
+# A statement seen this many times in one request is reported as repeated
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", 3))
+
+LOCKING_STATEMENT = re.compile(r"\bFOR (NO KEY )?UPDATE\b|\bFOR (KEY )?SHARE\b", re.IGNORECASE)
+
+
+class RequestSqlStats:
+    """
+    Statements issued while serving one request.
+
+    `lock_ms` is the time spent in row-locking statements (SELECT ... FOR
+    UPDATE and friends). Under contention that time is almost all waiting on
+    the lock, so it is the closest per-request figure for lock wait.
+    """
+
+    def __init__(self):
+        self.statements = 0
+        self.db_ms = 0.0
+        self.lock_ms = 0.0
+        self.seen = Counter()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.statements += 1
+        self.db_ms += elapsed_ms
+        if LOCKING_STATEMENT.search(statement):
+            self.lock_ms += elapsed_ms
+        self.seen[statement] += 1
+
+    def repeated(self) -> list[tuple[str, int]]:
+        return [
+            (statement, count)
+            for statement, count in self.seen.most_common()
+            if count >= SQL_REPEAT_THRESHOLD
+        ]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_ms:.2f};desc="{self.statements} statements", '
+            f"db-lock;dur={self.lock_ms:.2f}"
+        )
+
+
+current_sql_stats: ContextVar[Optional[RequestSqlStats]] = ContextVar(
+    "current_sql_stats", default=None
+)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_sql_stats.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_sql_stats.get()
+    if stats is None or not conn.info.get("query_start"):
+        return
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    stats.record(statement, elapsed_ms)
+
+
+def install_sql_instrumentation(engine) -> None:
+    """
+    Hooks an engine so its statements are counted against the current request.
+
+    Only statements run while a request is being tracked are recorded;
+    background work such as the SMS dispatcher is left out.
+    """
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+class RouteSqlMetrics:
+    """
+    Running per-route totals, served by /metrics/sql.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route: str, stats: RequestSqlStats) -> None:
+        with self.lock:
+            entry = self.routes.setdefault(
+                route,
+                {
+                    "requests": 0,
+                    "statements": 0,
+                    "max_statements": 0,
+                    "db_ms": 0.0,
+                    "lock_ms": 0.0,
+                    "over_budget": 0,
+                    "with_repeats": 0,
+                },
+            )
+            entry["requests"] += 1
+            entry["statements"] += stats.statements
+            entry["max_statements"] = max(entry["max_statements"], stats.statements)
+            entry["db_ms"] += stats.db_ms
+            entry["lock_ms"] += stats.lock_ms
+            if stats.statements > SQL_STATEMENT_BUDGET:
+                entry["over_budget"] += 1
+            if stats.repeated():
+                entry["with_repeats"] += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "statement_budget": SQL_STATEMENT_BUDGET,
+                "routes": {
+                    route: {
+                        **entry,
+                        "avg_statements": round(entry["statements"] / entry["requests"], 2),
+                        "avg_db_ms": round(entry["db_ms"] / entry["requests"], 2),
+                        "db_ms": round(entry["db_ms"], 2),
+                        "lock_ms": round(entry["lock_ms"], 2),
+                    }
+                    for route, entry in sorted(self.routes.items())
+                },
+            }
+
+
+route_sql_metrics = RouteSqlMetrics()
+
+
+def report_request_sql(route: str, stats: RequestSqlStats) -> None:
+    route_sql_metrics.record(route, stats)
+
+    repeated = stats.repeated()
+    if stats.statements > SQL_STATEMENT_BUDGET:
+        logger.warning(
+            "%s issued %d SQL statements (budget %d) in %.1f ms",
+            route,
+            stats.statements,
+            SQL_STATEMENT_BUDGET,
+            stats.db_ms,
+        )
+    for statement, count in repeated:
+        logger.warning(
+            "%s ran the same statement %d times, possible N+1: %s",
+            route,
+            count,
+            " ".join(statement.split())[:200],
+        )
@@ -0,0 +1,364 @@
+from botocore.auth import S3SigV4QueryAuth
+from botocore.awsrequest import AWSRequest
+from botocore.exceptions import BotoCoreError, ClientError
+from botocore.config import Config
+from typing import Iterable, Iterator, NamedTuple, Optional
+from datetime import datetime, timezone
+from urllib.parse import quote
+from dotenv import load_dotenv
+from pathlib import Path
+import boto3, mimetypes, os, threading
+
+load_dotenv(".env")
+
+# s3 (default), local or memory
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3").lower()
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "media")
+# Where main.py serves STORAGE_LOCAL_ROOT from when the local backend is on
+STORAGE_LOCAL_URL = os.getenv("STORAGE_LOCAL_URL", "/media").rstrip("/")
+
+AWS_REGION = os.getenv("AWS_REGION") or "us-east-1"
+BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
+
+# botocore keeps 10 connections per client by default, fewer than the S3
+# thread pool plus the concurrent rendition uploads can use at once
+S3_MAX_POOL_CONNECTIONS = max(
+    int(os.getenv("S3_MAX_POOL_CONNECTIONS", 32)), int(os.getenv("S3_IO_WORKERS", 8))
+)
+S3_CONNECT_TIMEOUT = float(os.getenv("S3_CONNECT_TIMEOUT", 5))
+S3_READ_TIMEOUT = float(os.getenv("S3_READ_TIMEOUT", 30))
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", 3))
+
+
+class StorageError(RuntimeError):
+    pass
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    last_modified: datetime
+
+
+class StorageBackend:
+    """
+    Where uploaded objects live. Every method blocks; async callers go
+    through file_upload.run_s3_job.
+    """
+
+    name = "base"
+
+    def put(self, object_key: str, data: bytes, content_type: str) -> None:
+        raise NotImplementedError
+
+    def get(self, object_key: str) -> bytes:
+        raise NotImplementedError
+
+    def head(self, object_key: str) -> Optional[dict]:
+        """ContentLength and ContentType, or None if the object is missing."""
+        raise NotImplementedError
+
+    def delete(self, object_key: str) -> None:
+        self.delete_many([object_key])
+
+    def delete_many(self, object_keys: list[str]) -> None:
+        raise NotImplementedError
+
+    def list_objects(self, prefix: str = "") -> Iterator[StoredObject]:
+        """Every object under `prefix`, read a page at a time."""
+        raise NotImplementedError
+
+    def sign_urls(self, object_keys: Iterable[str], expiration: int) -> dict[str, str]:
+        """Download URLs valid for at least `expiration` seconds."""
+        raise NotImplementedError
+
+    def url(self, object_key: str, expiration: int) -> str:
+        return self.sign_urls([object_key], expiration)[object_key]
+
+    def presigned_post(
+        self, object_key: str, content_type: str, max_bytes: int, expiration: int
+    ) -> dict:
+        raise StorageError(f"Direct uploads aren't supported by the {self.name} backend")
+
+
+# Error responses from S3, plus connection, timeout and credential errors
+# raised before any response arrives
+S3_ERRORS = (ClientError, BotoCoreError)
+
+
+class S3Storage(StorageBackend):
+    name = "s3"
+
+    def __init__(self, bucket: str = BUCKET_NAME, region: str = AWS_REGION):
+        self.bucket = bucket
+        self.region = region
+        self.session = boto3.Session(
+            region_name=region,
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        )
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Built on first use so importing the app never touches AWS config
+        with self._lock:
+            if self._client is None:
+                self._client = self.session.client(
+                    "s3",
+                    config=Config(
+                        signature_version="s3v4",
+                        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                        connect_timeout=S3_CONNECT_TIMEOUT,
+                        read_timeout=S3_READ_TIMEOUT,
+                        retries={"mode": "standard", "max_attempts": S3_MAX_ATTEMPTS},
+                        tcp_keepalive=True,
+                    ),
+                )
+            return self._client
+
+    def put(self, object_key: str, data: bytes, content_type: str) -> None:
+        try:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=object_key,
+                Body=data,
+                ContentType=content_type,
+                CacheControl="public, max-age=604800",
+            )
+        except S3_ERRORS as e:
+            raise StorageError(f"S3 upload failed: {e}")
+
+    def get(self, object_key: str) -> bytes:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=object_key)["Body"].read()
+        except S3_ERRORS as e:
+            raise StorageError(f"S3 download failed: {e}")
+
+    def head(self, object_key: str) -> Optional[dict]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=object_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise StorageError(f"S3 lookup failed: {e}")
+        except BotoCoreError as e:
+            raise StorageError(f"S3 lookup failed: {e}")
+
+    def delete(self, object_key: str) -> None:
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=object_key)
+        except S3_ERRORS as e:
+            raise StorageError(f"S3 delete failed: {e}")
+
+    def delete_many(self, object_keys: list[str]) -> None:
+        # delete_objects takes at most 1000 keys per request
+        for start in range(0, len(object_keys), 1000):
+            try:
+                response = self.client.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={
+                        "Objects": [{"Key": key} for key in object_keys[start : start + 1000]],
+                        "Quiet": True,
+                    },
+                )
+            except S3_ERRORS as e:
+                raise StorageError(f"S3 delete failed: {e}")
+            if response.get("Errors"):
+                failed = ", ".join(error["Key"] for error in response["Errors"])
+                raise StorageError(f"S3 delete failed for: {failed}")
+
+    def list_objects(self, prefix: str = "") -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        try:
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+                for item in page.get("Contents", []):
+                    yield StoredObject(item["Key"], item["Size"], item["LastModified"])
+        except S3_ERRORS as e:
+            raise StorageError(f"S3 listing failed: {e}")
+
+    def base_url(self) -> str:
+        # Dotted bucket names break the TLS wildcard on virtual-hosted URLs
+        if "." in self.bucket:
+            return f"https://s3.{self.region}.amazonaws.com/{self.bucket}/"
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/"
+
+    def sign_urls(self, object_keys: Iterable[str], expiration: int) -> dict[str, str]:
+        """
+        SigV4 presigned GET URLs for many keys at once.
+
+        The client's generate_presigned_url re-resolves the endpoint ruleset
+        for every key, which is most of its cost. Here credentials and
+        endpoint are resolved once per batch and botocore's signer does the
+        per-key HMAC, so the URLs are the same ones a SigV4 client would
+        produce.
+        """
+        credentials = self.session.get_credentials()
+        if credentials is None:
+            raise StorageError("S3 download URL generation failed: no AWS credentials")
+
+        signer = S3SigV4QueryAuth(
+            credentials.get_frozen_credentials(), "s3", self.region, expires=expiration
+        )
+        base_url = self.base_url()
+
+        urls = {}
+        for object_key in object_keys:
+            request = AWSRequest(method="GET", url=base_url + quote(object_key, safe="/~"))
+            signer.add_auth(request)
+            urls[object_key] = request.url
+        return urls
+
+    def presigned_post(
+        self, object_key: str, content_type: str, max_bytes: int, expiration: int
+    ) -> dict:
+        try:
+            return self.client.generate_presigned_post(
+                Bucket=self.bucket,
+                Key=object_key,
+                Fields={"Content-Type": content_type},
+                Conditions=[
+                    {"Content-Type": content_type},
+                    ["content-length-range", 1, max_bytes],
+                ],
+                ExpiresIn=expiration,
+            )
+        except S3_ERRORS as e:
+            raise StorageError(f"S3 upload policy generation failed: {e}")
+
+
+class LocalStorage(StorageBackend):
+    """
+    Objects as files under `root`, served by main.py at `base_url`. For
+    development and offline load tests; URLs are not signed.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str = STORAGE_LOCAL_ROOT, base_url: str = STORAGE_LOCAL_URL):
+        self.root = Path(root).resolve()
+        self.base_url = base_url
+
+    def path(self, object_key: str) -> Path:
+        path = (self.root / object_key.lstrip("/")).resolve()
+        if not path.is_relative_to(self.root):
+            raise StorageError(f"Object key escapes the storage root: {object_key}")
+        return path
+
+    def put(self, object_key: str, data: bytes, content_type: str) -> None:
+        path = self.path(object_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see half a file
+        partial = path.with_name(path.name + ".part")
+        partial.write_bytes(data)
+        partial.replace(path)
+
+    def get(self, object_key: str) -> bytes:
+        try:
+            return self.path(object_key).read_bytes()
+        except FileNotFoundError:
+            raise StorageError(f"No object {object_key}")
+
+    def head(self, object_key: str) -> Optional[dict]:
+        path = self.path(object_key)
+        if not path.is_file():
+            return None
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        return {"ContentLength": path.stat().st_size, "ContentType": content_type}
+
+    def delete_many(self, object_keys: list[str]) -> None:
+        for object_key in object_keys:
+            self.path(object_key).unlink(missing_ok=True)
+
+    def list_objects(self, prefix: str = "") -> Iterator[StoredObject]:
+        if not self.root.is_dir():
+            return
+        for path in sorted(self.root.rglob("*")):
+            key = path.relative_to(self.root).as_posix()
+            if path.is_file() and not key.endswith(".part") and key.startswith(prefix):
+                stat = path.stat()
+                modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+                yield StoredObject(key, stat.st_size, modified)
+
+    def sign_urls(self, object_keys: Iterable[str], expiration: int) -> dict[str, str]:
+        return {
+            key: f"{self.base_url}/{quote(key.lstrip('/'), safe='/~')}" for key in object_keys
+        }
+
+
+class MemoryStorage(StorageBackend):
+    """
+    Objects in a dict, per process. For benchmarks and tests that shouldn't
+    touch disk or the network.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self.objects: dict[str, tuple[bytes, str, datetime]] = {}
+        self.lock = threading.Lock()
+
+    def put(self, object_key: str, data: bytes, content_type: str) -> None:
+        with self.lock:
+            self.objects[object_key] = (bytes(data), content_type, datetime.now(timezone.utc))
+
+    def get(self, object_key: str) -> bytes:
+        with self.lock:
+            if object_key not in self.objects:
+                raise StorageError(f"No object {object_key}")
+            return self.objects[object_key][0]
+
+    def head(self, object_key: str) -> Optional[dict]:
+        with self.lock:
+            if object_key not in self.objects:
+                return None
+            data, content_type, _ = self.objects[object_key]
+            return {"ContentLength": len(data), "ContentType": content_type}
+
+    def delete_many(self, object_keys: list[str]) -> None:
+        with self.lock:
+            for object_key in object_keys:
+                self.objects.pop(object_key, None)
+
+    def list_objects(self, prefix: str = "") -> Iterator[StoredObject]:
+        with self.lock:
+            objects = [
+                StoredObject(key, len(data), modified)
+                for key, (data, _, modified) in sorted(self.objects.items())
+                if key.startswith(prefix)
+            ]
+        yield from objects
+
+    def sign_urls(self, object_keys: Iterable[str], expiration: int) -> dict[str, str]:
+        return {key: f"memory://{key}" for key in object_keys}
+
+
+STORAGE_BACKENDS = {
+    "s3": S3Storage,
+    "local": LocalStorage,
+    "memory": MemoryStorage,
+}
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND not in STORAGE_BACKENDS:
+                raise ValueError(
+                    f"STORAGE_BACKEND must be one of {', '.join(STORAGE_BACKENDS)}, "
+                    f"got {STORAGE_BACKEND!r}"
+                )
+            _storage = STORAGE_BACKENDS[STORAGE_BACKEND]()
+        return _storage
+
+
+def set_storage(backend: StorageBackend) -> None:
+    """Swaps the backend, e.g. for a MemoryStorage in a benchmark."""
+    global _storage
+    with _storage_lock:
+        _storage = backend
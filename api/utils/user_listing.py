@@ -0,0 +1,139 @@
+from api.v1.schemas.registration import UserSummary
+from api.utils.presigned_urls import signed_urls_for
+from api.v1.models.phone_number import PhoneNumber
+from api.v1.models.floor import HallFloors
+from api.v1.models.user import User
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from sqlalchemy import func
+from datetime import date
+from typing import Optional
+import base64, json
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"after": last_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["after"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def apply_user_filters(
+    query,
+    status: Optional[str] = None,
+    exclude_status: Optional[str] = None,
+    hall: Optional[str] = None,
+    floor: Optional[int] = None,
+    gender: Optional[str] = None,
+    category: Optional[str] = None,
+    arrival_date: Optional[date] = None,
+):
+    if status:
+        query = query.filter(User.active_status == status)
+    if exclude_status:
+        query = query.filter(User.active_status != exclude_status)
+    if hall:
+        query = query.filter(func.lower(User.hall_name) == hall.lower())
+    if floor is not None:
+        query = query.filter(HallFloors.floor_no == floor)
+    if gender:
+        query = query.filter(User.gender == gender.lower())
+    if category:
+        query = query.filter(User.category == category)
+    if arrival_date:
+        query = query.filter(User.arrival_date == arrival_date)
+    return query
+
+
+def user_summary_query(db: Session, **filters):
+    """
+    Users with their phone number and floor number, in one joined query.
+    """
+    query = (
+        db.query(User, PhoneNumber.phone_number, HallFloors.floor_no)
+        .outerjoin(PhoneNumber, PhoneNumber.id == User.phone_number_id)
+        .outerjoin(HallFloors, HallFloors.floor_id == User.floor)
+    )
+    return apply_user_filters(query, **filters)
+
+
+def count_users(db: Session, **filters) -> int:
+    query = db.query(func.count(User.id))
+    # Only pay for the floor join when filtering on floor number
+    if filters.get("floor") is not None:
+        query = query.outerjoin(HallFloors, HallFloors.floor_id == User.floor)
+    return apply_user_filters(query, **filters).scalar()
+
+
+def to_user_summary(
+    u: User,
+    phone_number: Optional[str],
+    floor_no: Optional[int],
+    profile_picture_url: Optional[str] = None,
+) -> UserSummary:
+    return UserSummary(
+        id=u.id,
+        first_name=u.first_name,
+        category=u.category,
+        hall_name=u.hall_name if u.hall_name else None,
+        floor=f"Floor {floor_no}" if floor_no is not None else None,
+        bed_number=u.bed_number,
+        extra_beds=u.extra_beds or [],
+        phone_number=phone_number or "Unknown",
+        active_status=u.active_status,
+        profile_picture_url=profile_picture_url or u.profile_picture_url,
+        local_assembly=u.local_assembly,
+        local_assembly_address=u.local_assembly_address,
+        arrival_date=u.arrival_date,
+        state=u.state,
+        gender=u.gender,
+    )
+
+
+def list_user_summaries(
+    db: Session,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    include_total: bool = False,
+    **filters,
+) -> tuple[list[UserSummary], Optional[str], Optional[int]]:
+    """
+    One page of users ordered by id, plus the cursor for the next page and,
+    if asked for, the total matching the filters.
+
+    Paging with a cursor seeks straight to `id > last_id` on the primary key,
+    so page 150 costs the same as page 1. `skip` is still honoured when no
+    cursor is given, for older clients.
+    """
+    query = user_summary_query(db, **filters).order_by(User.id)
+    if cursor:
+        query = query.filter(User.id > decode_cursor(cursor))
+    elif skip:
+        query = query.offset(skip)
+
+    # Fetch one extra row to learn whether another page exists
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(rows[-1][0].id) if has_more and rows else None
+    total = count_users(db, **filters) if include_total else None
+    # Stored URLs expire after minutes; sign the whole page in one pass.
+    # Lists only show avatars, so they get the 64px thumbnail
+    urls = signed_urls_for([u for u, _, _ in rows], rendition="thumb")
+
+    return (
+        [
+            to_user_summary(u, phone, floor_no, urls.get(u.object_key))
+            for u, phone, floor_no in rows
+        ],
+        next_cursor,
+        total,
+    )
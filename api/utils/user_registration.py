@@ -2,15 +2,26 @@ from api.utils.bed_allocation import (
     allocate_bed,
     fetch_user_information_for_reallocation,
 )
-from api.utils.file_upload import process_and_upload_image, delete_from_s3
+from api.utils.file_upload import (
+    build_user_object_key,
+    create_download_presigned_url,
+    delete_profile_picture,
+    process_and_upload_image,
+)
+from api.utils.direct_upload import object_key_from_upload_token, renditions_ready_at
 from api.utils.bed_allocation import validate_gender, allocate_backup_bed
 from api.utils.bed_allocation import compute_hall_statistics
+from api.utils.bed_allocation import release_floor_beds, user_bed_labels
+from api.utils.floor_occupancy import track_user_added, track_user_removed
 from api.v1.services.full_halls import send_hall_full_email
+from api.utils.message import queue_sms_termii, queue_sms_termii_attendance_only
 from api.v1.models.phone_number import PhoneNumber
 from api.v1.models.user import User
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException
-from datetime import datetime
+from datetime import datetime, timezone
 
 
 def persist_user(
@@ -24,6 +35,8 @@ def persist_user(
     image_url: str,
     object_key: str,
     active_status: str | None = None,
+    commit: bool = True,
+    renditions_at: datetime | None = None,
 ):
     user = User(
         first_name=payload.first_name,
@@ -46,23 +59,42 @@ def persist_user(
         medical_issues=payload.medical_issues,
         profile_picture_url=image_url,
         object_key=object_key,
+        renditions_at=renditions_at,
         date_presigned_url_generated=datetime.utcnow(),
         active_status=active_status,
     )
 
     db.add(user)
+    track_user_added(db, floor_id, active_status)
+    if not commit:
+        db.flush()
+        return user
+
     db.commit()
     db.refresh(user)
     return user
 
 
-async def register_user_service(db: Session, payload, phone, file, number):
+async def register_user_service(
+    db: AsyncSession, payload, phone, file, number, upload_token: str | None = None
+):
+    """
+    Runs on the async session; the allocation and persistence helpers are
+    shared with the sync routes and run on its connection through run_sync.
+
+    With an upload_token the picture was already uploaded straight to S3
+    through /uploads, so only its key is recorded.
+    """
     gender = validate_gender(payload.category)
+    if upload_token:
+        object_key = object_key_from_upload_token(upload_token, number)
+        image_url = create_download_presigned_url(object_key)
+        renditions_at = await renditions_ready_at(object_key)
 
-    hall, floor, beds = allocate_bed(db, gender, payload)
+    hall, floor, beds = await db.run_sync(allocate_bed, gender, payload)
     if not hall:
         if floor:
-            stats = compute_hall_statistics(db, floor)
+            stats = await db.run_sync(compute_hall_statistics, floor)
             await send_hall_full_email(
                 hall=floor,
                 total_beds=stats["total_beds"],
@@ -74,14 +106,17 @@ async def register_user_service(db: Session, payload, phone, file, number):
             detail="Kindly Report for Physical Allocation.",
         )
 
-    object_key = None
+    uploaded_key = None
     try:
-        image_url, object_key = await process_and_upload_image(
-            file, payload.first_name, number
-        )
+        if not upload_token:
+            image_url, object_key = await process_and_upload_image(
+                file, payload.first_name, number
+            )
+            uploaded_key = object_key
+            renditions_at = datetime.now(timezone.utc)
 
-        user = persist_user(
-            db=db,
+        user = await db.run_sync(
+            persist_user,
             payload=payload,
             phone=phone,
             hall=hall,
@@ -90,14 +125,30 @@ async def register_user_service(db: Session, payload, phone, file, number):
             gender=gender,
             image_url=image_url,
             object_key=object_key,
+            commit=False,
+            renditions_at=renditions_at,
+        )
+        # Confirmation SMS commits atomically with the user
+        await db.run_sync(
+            queue_sms_termii,
+            phone_number=number,
+            name=user.first_name,
+            arrival_date=str(user.arrival_date),
+            hall=user.hall_name,
+            floor=floor.floor_no,
+            bed_no=user.bed_number,
+            country=user.country,
         )
+        await db.commit()
+        await db.refresh(user)
 
         return user, floor
 
     except Exception:
-        db.rollback()
-        if object_key:
-            delete_from_s3(object_key)
+        await db.rollback()
+        # A direct upload stays in place so the same token can be retried
+        if uploaded_key:
+            delete_profile_picture(uploaded_key)
         raise
 
 
@@ -133,6 +184,14 @@ async def manual_register_user_service(
         # Delete the late comer FIRST, before creating the new user.
         # Both the delete and the insert will be committed together
         # inside persist_user's db.commit(), keeping it atomic.
+        # Any of the late comer's beds the new user doesn't take go back
+        # into the floor's free pool.
+        release_floor_beds(
+            db,
+            floor,
+            [bed for bed in user_bed_labels(late_comer_user) if bed not in beds],
+        )
+        track_user_removed(db, late_comer_user)
         db.delete(late_comer_user)
         db.delete(late_comer_phone)
 
@@ -146,6 +205,7 @@ async def manual_register_user_service(
             gender=gender,
             image_url=image_url,
             object_key=object_key,
+            renditions_at=datetime.now(timezone.utc),
         )
 
         return user, floor
@@ -153,26 +213,36 @@ async def manual_register_user_service(
     except Exception:
         db.rollback()
         if object_key:
-            delete_from_s3(object_key)
+            delete_profile_picture(object_key)
         raise
 
 
-async def backup_user_service(db: Session, payload, phone, file, number):
+async def backup_user_service(
+    db: AsyncSession, payload, phone, file, number, upload_token: str | None = None
+):
     gender = validate_gender(payload.category)
-    hall, floor, beds = allocate_backup_bed(db, gender, payload)
+    hall, floor, beds = await db.run_sync(allocate_backup_bed, gender, payload)
     if not hall:
         raise HTTPException(
             status_code=400,
             detail="Kindly Report for Physical Allocation.",
         )
-    object_key = None
+    if upload_token:
+        object_key = object_key_from_upload_token(upload_token, number)
+        image_url = create_download_presigned_url(object_key)
+        renditions_at = await renditions_ready_at(object_key)
+
+    uploaded_key = None
     try:
-        image_url, object_key = await process_and_upload_image(
-            file, payload.first_name, number
-        )
+        if not upload_token:
+            image_url, object_key = await process_and_upload_image(
+                file, payload.first_name, number
+            )
+            uploaded_key = object_key
+            renditions_at = datetime.now(timezone.utc)
 
-        user = persist_user(
-            db=db,
+        user = await db.run_sync(
+            persist_user,
             payload=payload,
             phone=phone,
             hall=hall,
@@ -182,14 +252,19 @@ async def backup_user_service(db: Session, payload, phone, file, number):
             image_url=image_url,
             object_key=object_key,
             active_status="active",
+            commit=False,
+            renditions_at=renditions_at,
         )
+        await db.commit()
+        await db.refresh(user)
 
         return user, floor
 
     except Exception:
-        db.rollback()
-        if object_key:
-            delete_from_s3(object_key)
+        await db.rollback()
+        # A direct upload stays in place so the same token can be retried
+        if uploaded_key:
+            delete_profile_picture(uploaded_key)
         raise
 
 
@@ -211,18 +286,28 @@ def register_phone_number_manually(phone_number, db):
     return phone
 
 
-async def attendance_only_register_service(db: Session, payload, phone, file, number):
+async def attendance_only_register_service(
+    db: AsyncSession, payload, phone, file, number, upload_token: str | None = None
+):
     gender = validate_gender(payload.category)
     payload.no_children = payload.no_children or 0
 
-    object_key = None
+    if upload_token:
+        object_key = object_key_from_upload_token(upload_token, number)
+        image_url = create_download_presigned_url(object_key)
+        renditions_at = await renditions_ready_at(object_key)
+
+    uploaded_key = None
     try:
-        image_url, object_key = await process_and_upload_image(
-            file, payload.first_name, number
-        )
+        if not upload_token:
+            image_url, object_key = await process_and_upload_image(
+                file, payload.first_name, number
+            )
+            uploaded_key = object_key
+            renditions_at = datetime.now(timezone.utc)
 
-        user = persist_user(
-            db=db,
+        user = await db.run_sync(
+            persist_user,
             payload=payload,
             phone=phone,
             hall=None,
@@ -232,12 +317,111 @@ async def attendance_only_register_service(db: Session, payload, phone, file, nu
             image_url=image_url,
             object_key=object_key,
             active_status="inactive",
+            commit=False,
+            renditions_at=renditions_at,
         )
+        await db.run_sync(
+            queue_sms_termii_attendance_only,
+            phone_number=number,
+            name=user.first_name,
+            arrival_date=str(user.arrival_date),
+            country=user.country,
+        )
+        await db.commit()
+        await db.refresh(user)
 
         return user
 
     except Exception:
-        db.rollback()
-        if object_key:
-            delete_from_s3(object_key)
+        await db.rollback()
+        # A direct upload stays in place so the same token can be retried
+        if uploaded_key:
+            delete_profile_picture(uploaded_key)
         raise
+
+
+def batch_register_service(db: Session, rows) -> list[dict]:
+    """
+    Registers and allocates beds for a whole delegation in one transaction.
+
+    Each row runs inside its own savepoint so a failure (duplicate number,
+    unknown category, no bed left) is reported for that row without undoing
+    the others. Confirmation SMS are queued in the outbox with each row.
+
+    Photos are not taken here: every user gets a reserved object_key and
+    uploads to it later via /user/{number}/profile-picture.
+    """
+    results = []
+
+    for index, row in enumerate(rows):
+        result = {"index": index, "phone_number": row.phone_number}
+        savepoint = db.begin_nested()
+        try:
+            gender = validate_gender(row.category)
+
+            phone = (
+                db.query(PhoneNumber)
+                .filter(PhoneNumber.phone_number == row.phone_number)
+                .first()
+            )
+            if phone:
+                existing = db.query(User).filter(User.phone_number_id == phone.id).first()
+                if existing:
+                    raise HTTPException(409, "User already registered")
+            else:
+                phone = PhoneNumber(
+                    phone_number=row.phone_number,
+                    time_registered=datetime.utcnow(),
+                )
+                db.add(phone)
+                db.flush()
+
+            hall, floor, beds = allocate_bed(db, gender, row)
+            if not hall:
+                raise HTTPException(400, "Kindly Report for Physical Allocation.")
+
+            user = persist_user(
+                db=db,
+                payload=row,
+                phone=phone,
+                hall=hall,
+                floor_id=floor.floor_id,
+                beds=beds,
+                gender=gender,
+                image_url=None,
+                object_key=build_user_object_key(row.first_name, row.phone_number),
+                commit=False,
+            )
+            queue_sms_termii(
+                db,
+                phone_number=row.phone_number,
+                name=user.first_name,
+                arrival_date=str(user.arrival_date),
+                hall=user.hall_name,
+                floor=floor.floor_no,
+                bed_no=user.bed_number,
+                country=user.country,
+            )
+            savepoint.commit()
+
+            result.update(
+                status="registered",
+                id=user.id,
+                hall_name=user.hall_name,
+                floor=f"Floor {floor.floor_no}",
+                bed_number=user.bed_number,
+                extra_beds=user.extra_beds or [],
+            )
+
+        except HTTPException as exc:
+            savepoint.rollback()
+            result.update(status="failed", detail=exc.detail)
+
+        except SQLAlchemyError:
+            savepoint.rollback()
+            result.update(status="failed", detail="Database save failed.")
+
+        results.append(result)
+
+    db.commit()
+    return results
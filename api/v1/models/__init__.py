@@ -5,4 +5,6 @@ from api.v1.models.user import User
 from api.v1.models.image_categories import ImageCategory
 from api.v1.models.images import Image
 from api.v1.models.floor import HallFloors
-from api.v1.models.minister import Minister, MealRecord
\ No newline at end of file
+from api.v1.models.floor_bed import FloorBed, FloorBackupSlot
+from api.v1.models.minister import Minister, MealRecord
+from api.v1.models.sms_outbox import SmsOutbox
@@ -8,6 +8,8 @@ class Category(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     category_name = Column(String, nullable=False)
+    # "male", "female" or "unspecified", classified from the name on create
+    gender = Column(String, nullable=True)
     
     floors = relationship("HallFloors", secondary="floor_category_association", back_populates="categories")
 
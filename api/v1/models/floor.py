@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, ForeignKey, Enum, String
+from sqlalchemy import Table, Column, Integer, ForeignKey, Enum, String, Index, text
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.orm import relationship
 from api.db.database import Base
@@ -27,5 +27,24 @@ class HallFloors(Base):
     status = Column(Enum("full", "not-full", name="floor_status"), nullable=False, default="not-full")
     counter_value = Column(Integer, nullable=True, default=0)
 
+    # Occupancy counters kept in step by api.utils.floor_occupancy
+    all_users_count = Column(Integer, nullable=False, default=0, server_default="0")
+    active_users_count = Column(Integer, nullable=False, default=0, server_default="0")
+
     hall_relationship = relationship("Hall", back_populates="floors")
     user_floor = relationship("User", back_populates="floor_relationship")
+    beds = relationship("FloorBed", back_populates="floor_relationship", cascade="all, delete-orphan", passive_deletes=True)
+    backup_slots = relationship("FloorBackupSlot", back_populates="floor_relationship", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_hall_floors_hall_id_floor_no", "hall_id", "floor_no"),
+        # Allocation only ever looks at floors that still have space
+        Index(
+            "ix_hall_floors_open",
+            "hall_id",
+            "floor_no",
+            postgresql_where=text("status = 'not-full'"),
+        ),
+        # age_ranges @> ARRAY[...] containment checks
+        Index("ix_hall_floors_age_ranges", "age_ranges", postgresql_using="gin"),
+    )
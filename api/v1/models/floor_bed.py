@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Index, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from api.db.database import Base
+
+
+class FloorBed(Base):
+    __tablename__ = "floor_beds"
+
+    id = Column(Integer, primary_key=True, index=True)
+    floor_id = Column(UUID(as_uuid=True), ForeignKey("hall_floors.floor_id", ondelete="CASCADE"), nullable=False)
+    bed_no = Column(Integer, nullable=False)
+    bed_label = Column(String, nullable=False)
+    occupied = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+
+    floor_relationship = relationship("HallFloors", back_populates="beds")
+
+    __table_args__ = (
+        UniqueConstraint("floor_id", "bed_label", name="uq_floor_beds_floor_label"),
+        # Free-list index: lowest free bed on a floor is a single index probe
+        Index(
+            "ix_floor_beds_free",
+            "floor_id",
+            "bed_no",
+            "bed_label",
+            postgresql_where=text("NOT occupied"),
+        ),
+    )
+
+
+class FloorBackupSlot(Base):
+    __tablename__ = "floor_backup_slots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    floor_id = Column(UUID(as_uuid=True), ForeignKey("hall_floors.floor_id", ondelete="CASCADE"), nullable=False)
+    slot_no = Column(Integer, nullable=False)
+    slot_label = Column(String, nullable=False)
+    occupied = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+
+    floor_relationship = relationship("HallFloors", back_populates="backup_slots")
+
+    __table_args__ = (
+        UniqueConstraint("floor_id", "slot_label", name="uq_floor_backup_slots_floor_label"),
+        Index(
+            "ix_floor_backup_slots_free",
+            "floor_id",
+            "slot_no",
+            postgresql_where=text("NOT occupied"),
+        ),
+    )
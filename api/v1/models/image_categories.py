@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, DateTime, func
 from sqlalchemy.orm import relationship
 from api.db.database import Base
 
@@ -7,5 +7,8 @@ class ImageCategory(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     category_name = Column(String, unique=True, nullable=False)
+    # Bumped whenever an image is added to or removed from the category;
+    # the gallery's ETag/Last-Modified and page cache key off it
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     
-    images = relationship("Image", back_populates="image_category")
\ No newline at end of file
+    images = relationship("Image", back_populates="image_category")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum, ForeignKey, Integer
+from sqlalchemy import Column, String, Enum, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 from api.db.database import Base
 
@@ -11,4 +11,7 @@ class Image(Base):
     category_id = Column(Integer, ForeignKey("image_categories.id"), nullable=False)
     status = Column(Enum("in-use", "inactive", name="image_status_enum"), default="in-use", nullable=False)
     object_key = Column(String)
-    image_category = relationship("ImageCategory", back_populates="images")
\ No newline at end of file
+    image_category = relationship("ImageCategory", back_populates="images")
+
+    # Keyset pages of a category: WHERE category_id = ? AND id > ? ORDER BY id
+    __table_args__ = (Index("ix_images_category_id_id", "category_id", "id"),)
@@ -32,6 +32,8 @@ class Minister(Base):
     profile_picture_url = Column(String, nullable=True, default="getalife")
     object_key = Column(String, unique=True, nullable=False)
     date_presigned_url_generated = Column(Date, nullable=False)
+    # When the picture's RENDITIONS were written; until then lists show the master
+    renditions_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     meal_records = relationship("MealRecord", back_populates="minister", cascade="all, delete-orphan")
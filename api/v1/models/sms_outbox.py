@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Index, func, text
+from api.db.database import Base
+
+
+class SmsOutbox(Base):
+    __tablename__ = "sms_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    phone_number = Column(String, nullable=False)
+    message = Column(String, nullable=False)
+    status = Column(Enum("pending", "sending", "sent", "failed", name="sms_status_enum"), nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # When the message may next be picked up; also acts as the lease expiry
+    # while a dispatcher holds it in "sending"
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(String, nullable=True)
+    provider_message_id = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_sms_outbox_due",
+            "next_attempt_at",
+            postgresql_where=text("status IN ('pending', 'sending')"),
+        ),
+    )
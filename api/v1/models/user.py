@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, JSON, Enum, Index
 from sqlalchemy.orm import relationship
 from api.db.database import Base
 
@@ -29,9 +29,17 @@ class User(Base):
     profile_picture_url = Column(String, nullable=True, default="getalife")
     object_key = Column(String, unique=True, nullable=False)
     date_presigned_url_generated = Column(Date, nullable=False)
+    # When the picture's RENDITIONS were written; until then lists show the master
+    renditions_at = Column(DateTime(timezone=True), nullable=True)
 
     active_status = Column(Enum("active", "inactive", "relocated", name="active_status_enum"), default="inactive", nullable=False)
 
     phone = relationship("PhoneNumber", back_populates="user")
     hall = relationship("Hall", back_populates="residents")
     floor_relationship = relationship("HallFloors", back_populates="user_floor")
+
+    __table_args__ = (
+        Index("ix_users_phone_number_id", "phone_number_id"),
+        # Also serves lookups on floor alone (leftmost column)
+        Index("ix_users_floor_active_status", "floor", "active_status"),
+    )
@@ -7,6 +7,8 @@ from api.v1.routes.category_allocation import category_route
 from api.v1.routes.hall_registration import registration_route
 from api.v1.routes.images import images_route
 from api.v1.routes.ticketing_system import ticketing_route
+from api.v1.routes.metrics import metrics_route
+from api.v1.routes.uploads import uploads_route
 
 api_version_one = APIRouter(prefix="/api/v1")
 api_version_one.include_router(analytics_route)
@@ -14,4 +16,6 @@ api_version_one.include_router(hall_route)
 api_version_one.include_router(category_route)
 api_version_one.include_router(registration_route)
 api_version_one.include_router(images_route)
-api_version_one.include_router(ticketing_route)
\ No newline at end of file
+api_version_one.include_router(ticketing_route)
+api_version_one.include_router(metrics_route)
+api_version_one.include_router(uploads_route)
@@ -1,81 +1,47 @@
-from api.v1.schemas.analytics import UserCount, UsersMedicalConditions
+from api.v1.schemas.analytics import UserCount, UsersMedicalConditions, FloorOccupancyDrift, ExportFormat
+from api.v1.schemas.registration import ActiveStatus
+from api.utils.roster_export import stream_roster, EXPORT_FORMATS
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import date
+from api.utils.floor_occupancy import hall_occupancy, reconcile_floor_occupancy
 from api.v1.models.phone_number import PhoneNumber
-from api.v1.models.floor import HallFloors
 from fastapi import HTTPException, status
-from fastapi import APIRouter, Depends
-from api.v1.models.hall import Hall
+from fastapi import APIRouter, Depends, Query
 from api.v1.models.user import User
 from sqlalchemy.orm import Session
-from api.db.database import get_db
-from sqlalchemy import func
+from api.db.database import get_db, get_read_db
 
 analytics_route = APIRouter(prefix="/analytics", tags=["Analytics"])
 
 # Endpoint to get the total number of users
 @analytics_route.get("/total-users", response_model=UserCount)
-def get_total_registered_users(db: Session = Depends(get_db)):
+def get_total_registered_users(db: Session = Depends(get_read_db)):
     count = db.query(User).count()
     return {"total_users": count}
 
+# Endpoint to return the number of free spaces in every hall and floor
+@analytics_route.get("/hall-statistics")
+def get_all_hall_statistics(db: Session = Depends(get_read_db)):
+    return hall_occupancy(db)
+
 # Endpoint to return the number of free spaces in each hall floor
 @analytics_route.get("/{hall_name}/hall-statistics")
-def get_hall_statistics(hall_name: str, db: Session = Depends(get_db)):
-    # Check if the hall exists
-    hall = db.query(Hall).filter(func.lower(Hall.hall_name) == hall_name.lower()).first()
-    if not hall:
+def get_hall_statistics(hall_name: str, db: Session = Depends(get_read_db)):
+    halls = hall_occupancy(db, hall_name)
+    if not halls:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Hall not found"
         )
-
-    # Get the floors in the hall
-    floors = db.query(HallFloors).filter(HallFloors.hall_id == hall.id).all()
-    total_beds = sum(floor.no_beds for floor in floors) * 2
-
-    # Get the number of active users per floor
-    for floor in floors:
-        floor.active_users_count = db.query(User).filter(
-            User.floor == floor.floor_id,
-            User.active_status == "active"
-        ).count()
-
-    # Get all users per floor
-    for floor in floors:
-        floor.all_users_count = db.query(User).filter(
-            User.floor == floor.floor_id
-        ).count()
-
-    all_users_count = sum(floor.all_users_count for floor in floors)
-    verified_users_count = sum(floor.active_users_count for floor in floors)
-    remaining_space = total_beds - all_users_count
-
-    return{
-        "hall_name": hall.hall_name,
-        "no_floors": hall.no_floors,
-        "total_beds": total_beds,
-        "current_user_count": all_users_count,
-        "verified_user_count": verified_users_count,
-        "remaining_space": remaining_space,
-        
-        # Floor Specific Information
-        "floors": [
-            {
-                "floor_no": f"Floor {floor.floor_no}",
-                "no_beds": floor.no_beds,
-                "active_users_count": floor.active_users_count,
-                "all_users_count": floor.all_users_count,
-            }
-            for floor in floors
-        ]
-        
-    }
+    return halls[0]
 
 
 # Endpoint to get users with medical conditions
 @analytics_route.get(
     "/users-medical-conditions", response_model=list[UsersMedicalConditions]
 )
-def get_users_with_medical_conditions(db: Session = Depends(get_db)):
+def get_users_with_medical_conditions(db: Session = Depends(get_read_db)):
     rows = (
         db.query(User, PhoneNumber)
         .outerjoin(PhoneNumber, PhoneNumber.id == User.phone_number_id)
@@ -97,3 +63,32 @@ def get_users_with_medical_conditions(db: Session = Depends(get_db)):
         )
         for user, phone in rows
     ]
+
+
+# Endpoint to recompute per-floor occupancy counters from the users table
+@analytics_route.post("/reconcile-occupancy", response_model=list[FloorOccupancyDrift])
+def reconcile_occupancy(dry_run: bool = True, db: Session = Depends(get_db)):
+    return reconcile_floor_occupancy(db, dry_run=dry_run)
+
+
+# Endpoint to stream the full roster for hall wardens
+@analytics_route.get("/export/users")
+def export_users(
+    format: ExportFormat = ExportFormat.csv,
+    hall: Optional[str] = None,
+    floor: Optional[int] = None,
+    active_status: Optional[ActiveStatus] = Query(None, alias="status"),
+    arrival_date: Optional[date] = None,
+):
+    filename = f"roster-{date.today().isoformat()}.{format.value}"
+    return StreamingResponse(
+        stream_roster(
+            format.value,
+            hall=hall,
+            floor=floor,
+            status=active_status.value if active_status else None,
+            arrival_date=arrival_date,
+        ),
+        media_type=EXPORT_FORMATS[format.value],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,5 +1,7 @@
 from api.v1.schemas.category_registration import CategoryCreate, CategoryView
 from fastapi import APIRouter, Depends, HTTPException, status
+from api.utils.bed_allocation import category_genders, gender_classifier
+from api.utils.floor_eligibility import floor_eligibility
 from api.v1.models.category import Category
 from api.db.database import get_db
 from sqlalchemy.orm import Session
@@ -27,11 +29,13 @@ def create_category(
             detail="Category with this name already exists."
         )
     new_category = Category(
-        category_name=category.category_name
+        category_name=category.category_name,
+        gender=gender_classifier(category.category_name),
     )
 
     db.add(new_category)
     db.commit()
+    category_genders.refresh(db)
     db.refresh(new_category)
 
     return new_category
@@ -55,6 +59,8 @@ def delete_category(
 
     db.delete(category)
     db.commit()
+    floor_eligibility.invalidate()
+    category_genders.refresh(db)
     return
 
 # Get a Category by ID
@@ -1,6 +1,7 @@
 from api.v1.schemas.floor_management import FloorBedUpdate, FloorViewSchema, FloorUpdateField, FloorUpdateOperation, FloorUpdatePayload
 from fastapi import APIRouter, Depends, HTTPException, status
-from api.utils.bed_allocation import floor_create_logic
+from api.utils.bed_allocation import floor_create_logic, sync_floor_beds
+from api.utils.floor_eligibility import floor_eligibility
 from api.v1.schemas import hall_registration
 from api.v1.models import hall as hall_model
 from api.v1.models.category import Category
@@ -76,6 +77,8 @@ def update_hall(
         setattr(hall, field, value)
 
     db.commit()
+    # A hall's gender and name decide who its floors are open to
+    floor_eligibility.invalidate()
     db.refresh(hall)
     return hall
 
@@ -90,6 +93,7 @@ def delete_hall(
 
     db.delete(hall)
     db.commit()
+    floor_eligibility.invalidate()
     return
 
 # View the Floors in a Hall
@@ -168,7 +172,12 @@ def edit_floor_information(
         else:
             setattr(floor, field, value)
 
+    # Keep the per-bed ledger in step with the floor's bed count
+    if "no_beds" in payload.dict(exclude_unset=True):
+        sync_floor_beds(db, floor)
+
     db.commit()
+    floor_eligibility.rebuild(db)
     db.refresh(floor)
     return FloorViewSchema(
         floor_id=floor.floor_id,
@@ -242,6 +251,7 @@ def update_floor_attributes(
         floor.age_ranges = list(current_ranges)
 
     db.commit()
+    floor_eligibility.rebuild(db)
     db.refresh(floor)
 
     return FloorViewSchema(
@@ -4,24 +4,33 @@ from api.utils.user_registration import (
     register_phone_number_manually,
     backup_user_service,
     attendance_only_register_service,
+    batch_register_service,
 )
 from api.v1.schemas.registration import (
+    ActiveStatus,
+    BatchRegistration,
+    BatchRegistrationView,
     UserDisplay,
     UserRegistration,
     UserSummary,
     UserView,
 )
 from api.v1.schemas.phone_registration import PhoneNumberRegistration, PhoneNumberView
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from api.utils.file_upload import refresh_presigned_url_if_expired
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File, Form
+from api.utils.user_listing import list_user_summaries
+from api.utils.file_upload import process_and_upload_image
+from api.utils.presigned_urls import signed_picture_url
 from api.v1.models.phone_number import PhoneNumber
-from api.utils.message import send_sms_termii, send_sms_termii_attendance_only
+from api.utils.floor_occupancy import adjust_floor_occupancy
 from api.v1.models import phone_number, user
 from api.v1.models.floor import HallFloors
 from api.v1.models.user import User
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from api.db.database import get_db
-from datetime import datetime
+from sqlalchemy import select
+from api.db.database import get_db, get_async_db, get_read_db
+from datetime import date, datetime, timezone
+from typing import Optional
 
 registration_route = APIRouter(tags=["Hall Registration"])
 
@@ -59,34 +68,33 @@ def register_phone_number(
 async def register_user(
     number: str,
     payload: UserRegistration = Depends(UserRegistration.as_form),
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    file: Optional[UploadFile] = File(None),
+    upload_token: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    phone = db.query(PhoneNumber).filter(PhoneNumber.phone_number == number).first()
+    # The picture comes either as the multipart file or, when the browser
+    # uploaded it to S3 itself, as the token from /uploads/finalize
+    if (file is None) == (upload_token is None):
+        raise HTTPException(400, "Send either a file or an upload_token.")
+
+    phone = await db.scalar(select(PhoneNumber).where(PhoneNumber.phone_number == number))
     if not phone:
         raise HTTPException(404, "Phone number not found")
 
-    existing = db.query(User).filter(User.phone_number_id == phone.id).first()
+    existing = await db.scalar(select(User.id).where(User.phone_number_id == phone.id))
     if existing:
         raise HTTPException(409, "User already registered")
 
     new_user, floor = await register_user_service(
-        db=db, payload=payload, phone=phone, file=file, number=number
-    )
-
-    send_sms_termii(
-        phone_number=number,
-        name=new_user.first_name,
-        arrival_date=new_user.arrival_date,
-        hall=new_user.hall_name,
-        floor=floor.floor_no,
-        bed_no=new_user.bed_number,
-        country=new_user.country,
+        db=db,
+        payload=payload,
+        phone=phone,
+        file=file,
+        number=number,
+        upload_token=upload_token,
     )
 
-    floor_record = (
-        db.query(HallFloors).filter(HallFloors.floor_id == floor.floor_id).first()
-    )
+    floor_record = await db.get(HallFloors, floor.floor_id)
 
     return {
         "id": new_user.id,
@@ -108,6 +116,74 @@ async def register_user(
     }
 
 
+# Register a delegation of users in one transaction
+@registration_route.post("/register-users/batch", response_model=BatchRegistrationView)
+def register_users_batch(
+    payload: BatchRegistration,
+    db: Session = Depends(get_db),
+):
+    results = batch_register_service(db=db, rows=payload.users)
+
+    registered = sum(1 for result in results if result["status"] == "registered")
+    return {
+        "registered": registered,
+        "failed": len(results) - registered,
+        "results": results,
+    }
+
+
+# Upload the profile picture for a user registered without one (e.g. in a batch)
+@registration_route.put("/user/{number}/profile-picture", response_model=UserSummary)
+async def upload_profile_picture(
+    number: str,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+):
+    phone = db.query(PhoneNumber).filter(PhoneNumber.phone_number == number).first()
+    if not phone:
+        raise HTTPException(status_code=404, detail="Phone number not found.")
+
+    user_record = db.query(User).filter(User.phone_number_id == phone.id).first()
+    if not user_record:
+        raise HTTPException(
+            status_code=404, detail="No user registered with this number."
+        )
+
+    image_url, _ = await process_and_upload_image(
+        file, user_record.first_name, number, object_key=user_record.object_key
+    )
+    user_record.profile_picture_url = image_url
+    user_record.renditions_at = datetime.now(timezone.utc)
+    user_record.date_presigned_url_generated = datetime.utcnow()
+    db.commit()
+    db.refresh(user_record)
+
+    floor = None
+    if user_record.floor:
+        floor = (
+            db.query(HallFloors).filter(HallFloors.floor_id == user_record.floor).first()
+        )
+    floor_no = floor.floor_no if floor else None
+
+    return UserSummary(
+        id=user_record.id,
+        first_name=user_record.first_name,
+        category=user_record.category,
+        hall_name=user_record.hall_name,
+        floor=f"Floor {floor_no}" if floor_no else None,
+        bed_number=user_record.bed_number,
+        extra_beds=user_record.extra_beds or [],
+        phone_number=number,
+        active_status=user_record.active_status,
+        profile_picture_url=signed_picture_url(user_record),
+        local_assembly=user_record.local_assembly,
+        local_assembly_address=user_record.local_assembly_address,
+        arrival_date=user_record.arrival_date,
+        state=user_record.state,
+        gender=user_record.gender,
+    )
+
+
 # Register a User Manually by allocating them another's bed space
 @registration_route.post(
     "/register-user-manual/{number_manual_register}", response_model=UserDisplay
@@ -163,26 +239,30 @@ async def register_user_manually(
 async def register_attendance_only(
     number: str,
     payload: UserRegistration = Depends(UserRegistration.as_form),
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    file: Optional[UploadFile] = File(None),
+    upload_token: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    phone = db.query(PhoneNumber).filter(PhoneNumber.phone_number == number).first()
+    # The picture comes either as the multipart file or, when the browser
+    # uploaded it to S3 itself, as the token from /uploads/finalize
+    if (file is None) == (upload_token is None):
+        raise HTTPException(400, "Send either a file or an upload_token.")
+
+    phone = await db.scalar(select(PhoneNumber).where(PhoneNumber.phone_number == number))
     if not phone:
         raise HTTPException(404, "Phone number not found")
 
-    existing = db.query(User).filter(User.phone_number_id == phone.id).first()
+    existing = await db.scalar(select(User.id).where(User.phone_number_id == phone.id))
     if existing:
         raise HTTPException(409, "User already registered")
 
     new_user = await attendance_only_register_service(
-        db=db, payload=payload, phone=phone, file=file, number=number
-    )
-
-    send_sms_termii_attendance_only(
-        phone_number=number,
-        name=new_user.first_name,
-        arrival_date=str(new_user.arrival_date),
-        country=new_user.country,
+        db=db,
+        payload=payload,
+        phone=phone,
+        file=file,
+        number=number,
+        upload_token=upload_token,
     )
 
     return {
@@ -212,24 +292,35 @@ async def register_attendance_only(
 async def backup_register(
     phone_number: str,
     payload: UserRegistration = Depends(UserRegistration.as_form),
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    file: Optional[UploadFile] = File(None),
+    upload_token: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    phone = register_phone_number_manually(phone_number=phone_number, db=db)
+    # The picture comes either as the multipart file or, when the browser
+    # uploaded it to S3 itself, as the token from /uploads/finalize
+    if (file is None) == (upload_token is None):
+        raise HTTPException(400, "Send either a file or an upload_token.")
+
+    phone = await db.run_sync(
+        lambda session: register_phone_number_manually(phone_number=phone_number, db=session)
+    )
 
     if not phone:
         raise HTTPException(404, "Phone number not found")
 
-    existing = db.query(User).filter(User.phone_number_id == phone.id).first()
+    existing = await db.scalar(select(User.id).where(User.phone_number_id == phone.id))
     if existing:
         raise HTTPException(409, "User already registered")
 
     new_user, floor = await backup_user_service(
-        db=db, payload=payload, phone=phone, file=file, number=phone_number
-    )
-    floor_record = (
-        db.query(HallFloors).filter(HallFloors.floor_id == floor.floor_id).first()
+        db=db,
+        payload=payload,
+        phone=phone,
+        file=file,
+        number=phone_number,
+        upload_token=upload_token,
     )
+    floor_record = await db.get(HallFloors, floor.floor_id)
 
     return {
         "id": new_user.id,
@@ -276,7 +367,7 @@ def get_registered_user_by_phone(number: str, db: Session = Depends(get_db)):
             db.query(HallFloors).filter(HallFloors.floor_id == user_record.floor).first()
         )
 
-    profile_picture_url = refresh_presigned_url_if_expired(user_record, db)
+    profile_picture_url = signed_picture_url(user_record)
 
     floor_no = floor.floor_no if floor else None
 
@@ -303,59 +394,51 @@ def get_registered_user_by_phone(number: str, db: Session = Depends(get_db)):
     }
 
 
-# Return all users
-@registration_route.get("/users", response_model=list[UserSummary])
-def get_all_users(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
-    # 1. Fetch only the current page of users
-    users = (
-        db.query(user.User)
-        .order_by(user.User.id)  # <--- Add this
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+# Shared paging/filter parameters for the user list endpoints
+def user_list_params(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    hall: Optional[str] = None,
+    floor: Optional[int] = None,
+    gender: Optional[str] = None,
+    category: Optional[str] = None,
+    arrival_date: Optional[date] = None,
+    include_total: bool = False,
+) -> dict:
+    return {
+        "skip": skip,
+        "limit": limit,
+        "cursor": cursor,
+        "hall": hall,
+        "floor": floor,
+        "gender": gender,
+        "category": category,
+        "arrival_date": arrival_date,
+        "include_total": include_total,
+    }
 
-    # 2. Extract IDs for just THESE users to keep our maps small
-    user_phone_ids = [u.phone_number_id for u in users if u.phone_number_id]
-    user_floor_ids = [u.floor for u in users if u.floor]
 
-    # 3. Targeted Phone Map: Only fetch phones for the users on this page
-    phone_map = {
-        record.id: record.phone_number
-        for record in db.query(phone_number.PhoneNumber)
-        .filter(phone_number.PhoneNumber.id.in_(user_phone_ids))
-        .all()
-    }
+def paged_user_summaries(db: Session, response: Response, params: dict, **filters):
+    users, next_cursor, total = list_user_summaries(db, **params, **filters)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+    return users
 
-    # 4. Targeted Floor Map: This fixes the N+1 problem for floors too!
-    floor_map = {
-        f.floor_id: f.floor_no
-        for f in db.query(HallFloors)
-        .filter(HallFloors.floor_id.in_(user_floor_ids))
-        .all()
-    }
 
-    # 5. Build the response using our localized maps
-    return [
-        UserSummary(
-            id=u.id,
-            first_name=u.first_name,
-            category=u.category,
-            hall_name=u.hall_name if u.hall_name else None,
-            floor=f"Floor {floor_map.get(u.floor)}" if u.floor in floor_map else None,
-            bed_number=u.bed_number,
-            extra_beds=u.extra_beds or [],
-            phone_number=phone_map.get(u.phone_number_id, "Unknown"),
-            active_status=u.active_status,
-            profile_picture_url=u.profile_picture_url,
-            local_assembly=u.local_assembly,
-            local_assembly_address=u.local_assembly_address,
-            arrival_date=u.arrival_date,
-            state=u.state,
-            gender=u.gender,
-        )
-        for u in users
-    ]
+# Return all users
+@registration_route.get("/users", response_model=list[UserSummary])
+def get_all_users(
+    response: Response,
+    active_status: Optional[ActiveStatus] = Query(None, alias="status"),
+    params: dict = Depends(user_list_params),
+    db: Session = Depends(get_read_db),
+):
+    return paged_user_summaries(
+        db, response, params, status=active_status.value if active_status else None
+    )
 
 
 # Change a users active status from inactive to active
@@ -379,6 +462,7 @@ def activate_user(number: str, db: Session = Depends(get_db)):
             status_code=status.HTTP_400_BAD_REQUEST, detail="User is already Enrolled"
         )
     user_record.active_status = "active"
+    adjust_floor_occupancy(db, user_record.floor, active_delta=1)
     db.commit()
     db.refresh(user_record)
     floor_record = None
@@ -408,112 +492,25 @@ def activate_user(number: str, db: Session = Depends(get_db)):
         local_assembly_address=user_record.local_assembly_address,
         names_children=user_record.names_children,
         active_status=user_record.active_status,
-        profile_picture_url=user_record.profile_picture_url,
+        profile_picture_url=signed_picture_url(user_record),
     )
 
 
 # return all active users
 @registration_route.get("/active-users", response_model=list[UserSummary])
-def get_active_users(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
-    # 1. Fetch only ACTIVE users for the current page, with consistent ordering
-    users = (
-        db.query(user.User)
-        .filter(user.User.active_status == "active")
-        .order_by(user.User.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-    # 2. Collect IDs for Phones and Floors from just this batch of users
-    user_phone_ids = [u.phone_number_id for u in users if u.phone_number_id]
-    user_floor_ids = [u.floor for u in users if u.floor]
-
-    # 3. Targeted Phone Mapping
-    phone_map = {
-        record.id: record.phone_number
-        for record in db.query(phone_number.PhoneNumber)
-        .filter(phone_number.PhoneNumber.id.in_(user_phone_ids))
-        .all()
-    }
-
-    # 4. Targeted Floor Mapping (Fixes the slow internal db.query loop)
-    floor_map = {
-        f.floor_id: f.floor_no
-        for f in db.query(HallFloors)
-        .filter(HallFloors.floor_id.in_(user_floor_ids))
-        .all()
-    }
-
-    # 5. Return the mapped results
-    return [
-        UserSummary(
-            id=u.id,
-            first_name=u.first_name,
-            category=u.category,
-            hall_name=u.hall_name if u.hall_name else None,
-            floor=(f"Floor {floor_map.get(u.floor)}" if u.floor in floor_map else None),
-            bed_number=u.bed_number,
-            extra_beds=u.extra_beds or [],
-            phone_number=phone_map.get(u.phone_number_id, "Unknown"),
-            active_status=u.active_status,
-            profile_picture_url=u.profile_picture_url,
-            local_assembly=u.local_assembly,
-            local_assembly_address=u.local_assembly_address,
-            arrival_date=u.arrival_date,
-            state=u.state,
-            gender=u.gender,
-        )
-        for u in users
-    ]
+def get_active_users(
+    response: Response,
+    params: dict = Depends(user_list_params),
+    db: Session = Depends(get_read_db),
+):
+    return paged_user_summaries(db, response, params, status="active")
 
 
 # Return all inactive/unverified users
 @registration_route.get("/inactive-users", response_model=list[UserSummary])
-def get_inactive_users(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
-    users = (
-        db.query(user.User)
-        .filter(user.User.active_status != "active")
-        .order_by(user.User.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-    user_phone_ids = [u.phone_number_id for u in users if u.phone_number_id]
-    user_floor_ids = [u.floor for u in users if u.floor]
-
-    phone_map = {
-        record.id: record.phone_number
-        for record in db.query(phone_number.PhoneNumber)
-        .filter(phone_number.PhoneNumber.id.in_(user_phone_ids))
-        .all()
-    }
-
-    floor_map = {
-        f.floor_id: f.floor_no
-        for f in db.query(HallFloors)
-        .filter(HallFloors.floor_id.in_(user_floor_ids))
-        .all()
-    }
-
-    return [
-        UserSummary(
-            id=u.id,
-            first_name=u.first_name,
-            category=u.category,
-            hall_name=u.hall_name if u.hall_name else None,
-            floor=(f"Floor {floor_map.get(u.floor)}" if u.floor in floor_map else None),
-            bed_number=u.bed_number,
-            extra_beds=u.extra_beds or [],
-            phone_number=phone_map.get(u.phone_number_id, "Unknown"),
-            active_status=u.active_status,
-            profile_picture_url=u.profile_picture_url,
-            local_assembly=u.local_assembly,
-            local_assembly_address=u.local_assembly_address,
-            arrival_date=u.arrival_date,
-            state=u.state,
-            gender=u.gender,
-        )
-        for u in users
-    ]
+def get_inactive_users(
+    response: Response,
+    params: dict = Depends(user_list_params),
+    db: Session = Depends(get_read_db),
+):
+    return paged_user_summaries(db, response, params, exclude_status="active")
@@ -1,19 +1,54 @@
 from api.v1.schemas.Images import ImageCategoryCreate, ImageCategoryView, ImageCreate, ImageView, List
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
-from api.utils.file_upload import upload_to_s3, delete_from_s3
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request, Response, status, Depends, UploadFile, File
+from api.utils.gallery_cache import (
+    body_etag,
+    gallery_cache,
+    gallery_validators,
+    not_modified,
+    validator_headers,
+)
+from api.v1.services.object_deleter import object_deleter
+from api.utils.file_upload import upload_to_s3, delete_from_s3, run_s3_job
+from api.utils.user_listing import decode_cursor, encode_cursor
+from api.utils.presigned_urls import signed_urls_for
 from api.v1.models.image_categories import ImageCategory
 from api.v1.models.images import Image
+from api.db.database import get_db, get_read_db
 from sqlalchemy.orm import Session
-from api.db.database import get_db
+from typing import Optional
+from sqlalchemy import func
 from dotenv import load_dotenv
 load_dotenv(".env")
 import os, uuid
 
 images_route = APIRouter(tags=["Images Management"])
 
+
+def image_views(images) -> list[ImageView]:
+    # Stored image URLs expire after minutes; sign them all in one pass
+    urls = signed_urls_for(images)
+    return [
+        ImageView.model_validate(image).model_copy(
+            update={"image_url": urls.get(image.object_key, image.image_url)}
+        )
+        for image in images
+    ]
+
+
 @images_route.get("/categories/", response_model=List[ImageCategoryView])
-def view_image_categories(db: Session = Depends(get_db)):
-    categories = db.query(ImageCategory).all()
+def view_image_categories(
+    request: Request, response: Response, db: Session = Depends(get_read_db)
+):
+    categories = (
+        db.query(ImageCategory.id, ImageCategory.category_name)
+        .order_by(ImageCategory.id)
+        .all()
+    )
+
+    etag = body_etag(*(tuple(category) for category in categories))
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag))
+    response.headers.update(validator_headers(etag))
     return categories
 
 @images_route.post("/categories/", response_model=ImageCategoryView)
@@ -66,8 +101,11 @@ async def add_image_to_category(
     # Upload the image to AWS
     object_key = f"/{category_name}/{unique_name}"
     file_bytes = await file.read()
-    image_url = upload_to_s3(
-        file_bytes=file_bytes, object_key=object_key, content_type=file.content_type
+    image_url = await run_s3_job(
+        upload_to_s3,
+        file_bytes=file_bytes,
+        object_key=object_key,
+        content_type=file.content_type,
     )
 
     # Save to the DB
@@ -79,27 +117,74 @@ async def add_image_to_category(
         status="in-use",
     )
     db.add(new_image)
+    category.updated_at = func.clock_timestamp()
     db.commit()
     db.refresh(new_image)
+    gallery_cache.invalidate(category_id)
 
     return new_image
 
 
 @images_route.get("/{category_id}/images/", response_model=list[ImageView])
 def get_images_by_category(
-    category_id: int, db: Session = Depends(get_db)
+    category_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
 ):
+    """
+    One page of the category's images ordered by id; the next page's cursor
+    is in X-Next-Cursor. Send back the ETag in If-None-Match to get a 304
+    when nothing changed.
+    """
     # Check if the Category exists
-    category = db.query(ImageCategory).filter_by(id=category_id).first()
+    category = (
+        db.query(ImageCategory.id, ImageCategory.updated_at)
+        .filter(ImageCategory.id == category_id)
+        .first()
+    )
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Image category not found.",
         )
-    
-    # Return information on the categories
-    images = db.query(Image).filter_by(category_id=category_id).all()
-    return images
+
+    after = decode_cursor(cursor) if cursor else 0
+    etag, last_modified = gallery_validators(category.updated_at, category_id, after, limit)
+    headers = validator_headers(etag, last_modified)
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    key = (category_id, after, limit)
+    page = gallery_cache.get(key, category.updated_at)
+    if page is None:
+        # Seek past the cursor on (category_id, id) and fetch one extra row
+        # to learn whether another page exists
+        rows = (
+            db.query(
+                Image.id,
+                Image.image_name,
+                Image.image_url,
+                Image.category_id,
+                Image.status,
+                Image.object_key,
+            )
+            .filter(Image.category_id == category_id, Image.id > after)
+            .order_by(Image.id)
+            .limit(limit + 1)
+            .all()
+        )
+        next_after = rows[limit - 1].id if len(rows) > limit else None
+        page = rows[:limit], next_after
+        gallery_cache.put(key, category.updated_at, *page)
+
+    rows, next_after = page
+    response.headers.update(headers)
+    if next_after is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(next_after)
+    return image_views(rows)
 
 @images_route.get("/images/{image_id}/", response_model=ImageView)
 def get_image_by_id(
@@ -113,7 +198,7 @@ def get_image_by_id(
             detail="Image not found.",
         )
     
-    return image
+    return image_views([image])[0]
 
 @images_route.delete("/images/{image_id}/", status_code=status.HTTP_204_NO_CONTENT)
 def delete_image(
@@ -127,14 +212,19 @@ def delete_image(
             detail="Image not found.",
         )        
     object_key = image.object_key
+    category_id = image.category_id
     # Delete the image from the database
     delete_from_s3(object_key)
     db.delete(image)
+    db.query(ImageCategory).filter(ImageCategory.id == category_id).update(
+        {ImageCategory.updated_at: func.clock_timestamp()}, synchronize_session=False
+    )
     db.commit()
+    gallery_cache.invalidate(category_id)
 
 @images_route.delete("/categories/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_image_category(
-    category_id: int, db: Session = Depends(get_db)
+    category_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)
 ):
     #Check if the image category exits
     category = db.query(ImageCategory).filter(
@@ -147,20 +237,15 @@ def delete_image_category(
         )
         
     #Identify all images with that category id
-    images = db.query(Image).filter(
-        Image.category_id == category_id
-    ).all()
-    
-    try:
-        # Delete images from S3 and DB
-        for image in images:
-            if image.object_key:
-                delete_from_s3(image.object_key)
-            db.delete(image)
+    images = db.query(Image).filter(Image.category_id == category_id)
+    object_keys = [key for (key,) in images.with_entities(Image.object_key) if key]
 
-        # Delete the category itself
+    try:
+        # Delete the images and the category itself in one transaction
+        images.delete(synchronize_session=False)
         db.delete(category)
         db.commit()
+        gallery_cache.invalidate(category_id)
 
     except Exception as e:
         db.rollback()
@@ -168,3 +253,7 @@ def delete_image_category(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete image category.",
         )
+
+    # Storage is only touched once the rows are gone, in batched requests
+    # after the response; failed batches are retried by the deleter
+    background_tasks.add_task(object_deleter.delete, object_keys)
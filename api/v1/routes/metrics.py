@@ -0,0 +1,59 @@
+from api.utils.file_upload import image_pipeline_stats
+from api.v1.services.sms_dispatcher import outbox_stats
+from api.v1.services.object_deleter import object_deleter
+from api.utils.sql_instrumentation import route_sql_metrics
+from api.db.database import replica_stats
+from api.utils.presigned_urls import presigned_url_cache
+from api.utils.gallery_cache import gallery_cache
+from api.utils.floor_eligibility import floor_eligibility
+from fastapi import APIRouter
+
+metrics_route = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+# Queue depth of the image processing and S3 upload pools
+@metrics_route.get("/image-pipeline")
+def get_image_pipeline_metrics():
+    return image_pipeline_stats()
+
+
+# Number of outbox messages in each delivery state
+@metrics_route.get("/sms-outbox")
+def get_sms_outbox_metrics():
+    return outbox_stats()
+
+
+# SQL statements, DB time and lock time per route since startup
+@metrics_route.get("/sql")
+def get_sql_metrics():
+    return route_sql_metrics.snapshot()
+
+
+# Whether reads are currently served by the replica, and its lag
+@metrics_route.get("/replica")
+def get_replica_metrics():
+    return replica_stats()
+
+
+# Hit rate and size of the presigned URL cache
+@metrics_route.get("/presigned-urls")
+def get_presigned_url_metrics():
+    return presigned_url_cache.stats()
+
+
+# Stored objects deleted in the background, and batches waiting for a retry
+@metrics_route.get("/object-deletions")
+def get_object_deletion_metrics():
+    return object_deleter.stats()
+
+
+# Hit rate and size of the gallery page cache
+@metrics_route.get("/gallery-cache")
+def get_gallery_cache_metrics():
+    return gallery_cache.stats()
+
+
+# Size and age of the precomputed floor-eligibility index
+@metrics_route.get("/floor-eligibility")
+def get_floor_eligibility_metrics():
+    return floor_eligibility.stats()
@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from api.utils.file_upload import process_and_upload_image, delete_from_s3
+from api.utils.file_upload import process_and_upload_image, delete_profile_picture
 from api.utils.bed_allocation import allocate_minister_manually
+from api.utils.floor_occupancy import track_user_added
+from api.utils.presigned_urls import signed_urls_for
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from datetime import date, datetime, timezone
 from typing import List
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 
 
-from api.db.database import get_db
+from api.db.database import get_async_db, get_read_db
 from api.v1.models.minister import Minister, MealRecord
 from api.v1.models.user import User
 from api.v1.models.phone_number import PhoneNumber
@@ -24,18 +27,27 @@ from api.v1.schemas.ticketing import (
 ticketing_route = APIRouter(prefix="/ticketing", tags=["Ticketing System"])
 
 
+def minister_views(ministers, rendition: str | None = None) -> list[MinisterOut]:
+    # Stored picture URLs expire after minutes; sign them all in one pass
+    urls = signed_urls_for(ministers, rendition=rendition)
+    return [
+        MinisterOut.model_validate(m).model_copy(
+            update={"profile_picture_url": urls.get(m.object_key, m.profile_picture_url)}
+        )
+        for m in ministers
+    ]
+
+
 # Endpoint to register in ministers into the ticketing system
 @ticketing_route.post("/ministers/register", response_model=MinisterOut)
 async def register_minister(
     minister_in: MinisterCreate = Depends(MinisterCreate.as_form),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     file: UploadFile = File(...),
 ):
     # 1. Check for existing phone number
-    if (
-        db.query(Minister)
-        .filter(Minister.phone_number == minister_in.phone_number)
-        .first()
+    if await db.scalar(
+        select(Minister.id).where(Minister.phone_number == minister_in.phone_number)
     ):
         raise HTTPException(status_code=400, detail="Phone number already registered.")
 
@@ -45,12 +57,17 @@ async def register_minister(
         image_url, object_key = await process_and_upload_image(
             file, minister_in.first_name, minister_in.phone_number
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image upload failed: {str(e)}")
 
     # 3. Validate and retrieve hall/floor allocation if provided
-    hall, floor = allocate_minister_manually(
-        db, minister_in.hall_name, minister_in.floor_id, minister_in.bed_number
+    hall, floor = await db.run_sync(
+        allocate_minister_manually,
+        minister_in.hall_name,
+        minister_in.floor_id,
+        minister_in.bed_number,
     )
 
     # 4. Save to Database
@@ -67,6 +84,7 @@ async def register_minister(
             local_assembly_address=minister_in.local_assembly_address,
             profile_picture_url=image_url,
             object_key=object_key,
+            renditions_at=datetime.now(timezone.utc),
             date_presigned_url_generated=date.today(),
             hall_name=hall.hall_name if hall else None,
             floor=floor.floor_id if floor else None,
@@ -76,21 +94,19 @@ async def register_minister(
         db.add(new_minister)
 
         # 5. Save to User Table as well
-        phone = (
-            db.query(PhoneNumber)
-            .filter(PhoneNumber.phone_number == minister_in.phone_number)
-            .first()
+        phone = await db.scalar(
+            select(PhoneNumber).where(PhoneNumber.phone_number == minister_in.phone_number)
         )
         if not phone:
             phone = PhoneNumber(
                 phone_number=minister_in.phone_number,
-                time_registered=datetime.now(timezone.utc),
+                time_registered=datetime.utcnow(),
             )
             db.add(phone)
-            db.flush()  # ensure phone.id is available
+            await db.flush()  # ensure phone.id is available
 
         # Check for existing user to avoid duplicates
-        existing_user = db.query(User).filter(User.phone_number_id == phone.id).first()
+        existing_user = await db.scalar(select(User.id).where(User.phone_number_id == phone.id))
         if existing_user:
             raise HTTPException(
                 status_code=400,
@@ -118,25 +134,27 @@ async def register_minister(
             medical_issues=minister_in.medical_issues,
             profile_picture_url=image_url,
             object_key=object_key,
+            renditions_at=datetime.now(timezone.utc),
             date_presigned_url_generated=date.today(),
             hall_name=hall.hall_name if hall else None,
             floor=str(floor.floor_id) if floor else None,
             bed_number=minister_in.bed_number if floor else None,
         )
         db.add(new_user)
+        await db.run_sync(track_user_added, floor.floor_id if floor else None, "active")
 
-        db.commit()
-        db.refresh(new_minister)
+        await db.commit()
+        await db.refresh(new_minister)
         return new_minister
 
     except HTTPException:
-        db.rollback()
+        await db.rollback()
         raise
 
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         if object_key:
-            delete_from_s3(object_key)
+            delete_profile_picture(object_key)
 
         print(f"DATABASE ERROR: {e}")
 
@@ -150,19 +168,21 @@ async def register_minister(
 @ticketing_route.post(
     "/meals/mark", response_model=MealRecordOut, status_code=status.HTTP_201_CREATED
 )
-def mark_meal(meal_in: MealMarkInput, db: Session = Depends(get_db)):
+async def mark_meal(meal_in: MealMarkInput, db: AsyncSession = Depends(get_async_db)):
     # 1. Search by either identifier in one go
     minister = (
-        db.query(Minister)
-        .filter(
-            or_(
-                Minister.identification_meal_number
-                == meal_in.identification_meal_number,
-                Minister.phone_number == meal_in.phone_number,
+        await db.scalars(
+            select(Minister)
+            .where(
+                or_(
+                    Minister.identification_meal_number
+                    == meal_in.identification_meal_number,
+                    Minister.phone_number == meal_in.phone_number,
+                )
             )
+            .limit(1)
         )
-        .first()
-    )
+    ).first()
 
     if not minister:
         raise HTTPException(status_code=404, detail="Minister not found.")
@@ -173,22 +193,26 @@ def mark_meal(meal_in: MealMarkInput, db: Session = Depends(get_db)):
         minister_id=minister.id, date=meal_date, meal_type=meal_in.meal_type.lower()
     )
 
+    # Read up front: a failed commit expires the minister, and an async
+    # session cannot lazy-load it back
+    minister_name = minister.first_name
+
     db.add(new_record)
     try:
-        db.commit()
-        db.refresh(new_record)
+        await db.commit()
+        await db.refresh(new_record)
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=400,
-            detail=f"{minister.first_name} has already taken {meal_in.meal_type} for today.",
+            detail=f"{minister_name} has already taken {meal_in.meal_type} for today.",
         )
     return new_record
 
 
 # Endpoint to check if a minister has gotten a meal
 @ticketing_route.get("/meals/status/{phone_number}", response_model=MinisterStatusOut)
-def get_meal_status(phone_number: str, db: Session = Depends(get_db)):
+def get_meal_status(phone_number: str, db: Session = Depends(get_read_db)):
     minister = db.query(Minister).filter(Minister.phone_number == phone_number).first()
     if not minister:
         raise HTTPException(
@@ -204,13 +228,15 @@ def get_meal_status(phone_number: str, db: Session = Depends(get_db)):
     meal_dates = [record.date for record in records]
 
     return MinisterStatusOut(
-        minister=minister, total_meals_taken=len(records), meal_dates=meal_dates
+        minister=minister_views([minister])[0],
+        total_meals_taken=len(records),
+        meal_dates=meal_dates,
     )
 
 
 # Endpoint to fetch ministers that haven't had a meal
 @ticketing_route.get("/meals/pending", response_model=List[MinisterOut])
-def get_pending_ministers(meal_type: str, db: Session = Depends(get_db)):
+def get_pending_ministers(meal_type: str, db: Session = Depends(get_read_db)):
     """
     Fetch ministers who haven't had a SPECIFIC meal today.
     Example: /meals/pending?meal_type=lunch
@@ -227,12 +253,12 @@ def get_pending_ministers(meal_type: str, db: Session = Depends(get_db)):
         .all()
     )
 
-    return pending_ministers
+    return minister_views(pending_ministers, rendition="thumb")
 
 
 # Endpoint to fetch meal summary for a specific day
 @ticketing_route.get("/meals/summary/{target_date}", response_model=DailyMealSummaryOut)
-def get_daily_meal_summary(target_date: date, db: Session = Depends(get_db)):
+def get_daily_meal_summary(target_date: date, db: Session = Depends(get_read_db)):
     """
     Fetch all ministers who have eaten on a specific date, broken down by meal period.
     """
@@ -247,13 +273,14 @@ def get_daily_meal_summary(target_date: date, db: Session = Depends(get_db)):
     lunch = []
     dinner = []
 
-    for record in records:
+    views = minister_views([record.minister for record in records], rendition="thumb")
+    for record, minister in zip(records, views):
         if record.meal_type == "breakfast":
-            breakfast.append(record.minister)
+            breakfast.append(minister)
         elif record.meal_type == "lunch":
-            lunch.append(record.minister)
+            lunch.append(minister)
         elif record.meal_type == "dinner":
-            dinner.append(record.minister)
+            dinner.append(minister)
 
     return DailyMealSummaryOut(
         date=target_date,
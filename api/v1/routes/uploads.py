@@ -0,0 +1,46 @@
+from api.utils.direct_upload import (
+    create_upload_session,
+    finalize_upload,
+    process_direct_upload,
+)
+from api.v1.schemas.uploads import (
+    UploadFinalize,
+    UploadFinalizeView,
+    UploadSessionCreate,
+    UploadSessionView,
+)
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from api.v1.models.phone_number import PhoneNumber
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.db.database import get_async_db
+from sqlalchemy import select
+
+uploads_route = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+
+# Start a browser upload of a profile picture straight to S3
+@uploads_route.post("/profile-picture/{number}", response_model=UploadSessionView)
+async def start_profile_picture_upload(
+    number: str,
+    payload: UploadSessionCreate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    POST the file to `url` as multipart form data with every entry of
+    `fields` before the file, then call /uploads/finalize with the token.
+    """
+    if not await db.scalar(select(PhoneNumber.id).where(PhoneNumber.phone_number == number)):
+        raise HTTPException(404, "Phone number not found")
+
+    return create_upload_session(number, payload.content_type)
+
+
+# Confirm a browser upload and queue its resize
+@uploads_route.post("/finalize", response_model=UploadFinalizeView, status_code=202)
+async def finalize_profile_picture_upload(
+    payload: UploadFinalize, background_tasks: BackgroundTasks
+):
+    claims, token = await finalize_upload(payload.upload_token)
+    background_tasks.add_task(process_direct_upload, claims["raw"], claims["key"])
+
+    return {"upload_token": token, "object_key": claims["key"], "status": "processing"}
@@ -29,3 +29,4 @@ class ImageView(BaseModel):
 
     class Config:
         orm_mode = True
+        from_attributes = True
@@ -1,4 +1,6 @@
 from pydantic import BaseModel
+from enum import Enum
+from uuid import UUID
 class UserCount(BaseModel):
     total_users: int
     
@@ -6,3 +8,19 @@ class UsersMedicalConditions(BaseModel):
     user_name: str
     phone_number: str
     medical_condition: str
+
+
+class FloorOccupancyDrift(BaseModel):
+    floor_id: UUID
+    hall_id: int
+    floor_no: int
+    stored_all_users_count: int
+    actual_all_users_count: int
+    stored_active_users_count: int
+    actual_active_users_count: int
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+    xlsx = "xlsx"
@@ -15,7 +15,8 @@ class CategoryUpdate(BaseModel):
 class CategoryView(BaseModel):
     id: int
     category_name: str
-    
+    gender: Optional[str] = None
+
 
     class Config:
         orm_mode = True
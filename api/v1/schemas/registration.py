@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict, Field
-from typing import Optional
+from typing import Optional, List
 from datetime import date
 from fastapi import Form
 from enum import Enum
@@ -16,6 +16,13 @@ class AgeRangeEnum(str, Enum):
     age_71_plus = "71+"
 
 
+# Values of the users.active_status enum
+class ActiveStatus(str, Enum):
+    active = "active"
+    inactive = "inactive"
+    relocated = "relocated"
+
+
 class UserBase(BaseModel):
     category: str
     first_name: str
@@ -110,3 +117,29 @@ class UserSummary(BaseModel):
     gender: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class BatchUserRegistration(UserRegistration):
+    phone_number: str
+
+
+class BatchRegistration(BaseModel):
+    users: List[BatchUserRegistration] = Field(..., min_length=1, max_length=500)
+
+
+class BatchRegistrationResult(BaseModel):
+    index: int
+    phone_number: str
+    status: str
+    detail: Optional[str] = None
+    id: Optional[int] = None
+    hall_name: Optional[str] = None
+    floor: Optional[str] = None
+    bed_number: Optional[str] = None
+    extra_beds: Optional[list[str]] = None
+
+
+class BatchRegistrationView(BaseModel):
+    registered: int
+    failed: int
+    results: List[BatchRegistrationResult]
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+
+
+class UploadSessionCreate(BaseModel):
+    content_type: str = Field(..., example="image/jpeg")
+
+
+class UploadSessionView(BaseModel):
+    url: str
+    fields: dict[str, str]
+    upload_token: str
+    object_key: str
+    max_bytes: int
+    expires_in: int
+
+
+class UploadFinalize(BaseModel):
+    upload_token: str
+
+
+class UploadFinalizeView(BaseModel):
+    upload_token: str
+    object_key: str
+    status: str
@@ -0,0 +1,150 @@
+from api.utils.storage import StorageBackend, StorageError, get_storage
+from api.utils.file_upload import run_s3_job
+import asyncio, heapq, itertools, logging, os, time
+
+logger = logging.getLogger(__name__)
+
+# delete_objects accepts at most 1000 keys per request
+OBJECT_DELETE_BATCH_SIZE = min(int(os.getenv("OBJECT_DELETE_BATCH_SIZE", 1000)), 1000)
+OBJECT_DELETE_CONCURRENCY = int(os.getenv("OBJECT_DELETE_CONCURRENCY", 4))
+OBJECT_DELETE_MAX_ATTEMPTS = int(os.getenv("OBJECT_DELETE_MAX_ATTEMPTS", 5))
+OBJECT_DELETE_BACKOFF_BASE = float(os.getenv("OBJECT_DELETE_BACKOFF_BASE", 2))
+OBJECT_DELETE_BACKOFF_MAX = float(os.getenv("OBJECT_DELETE_BACKOFF_MAX", 300))
+
+
+def backoff_delay(attempts: int) -> float:
+    return min(OBJECT_DELETE_BACKOFF_BASE * (2 ** (attempts - 1)), OBJECT_DELETE_BACKOFF_MAX)
+
+
+class ObjectDeleter:
+    """
+    Deletes stored objects in batches, several batches at a time, after the
+    database change that orphaned them has committed.
+
+    A failed batch goes on an in-process retry queue with exponential
+    backoff, drained by a background task started in main.py. Batches still
+    queued at shutdown, or that run out of attempts, are logged; the orphan
+    GC (api.utils.orphan_gc) removes them later.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend | None = None,
+        batch_size: int = OBJECT_DELETE_BATCH_SIZE,
+        concurrency: int = OBJECT_DELETE_CONCURRENCY,
+    ):
+        self._storage = storage
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # (due, seq, attempts, keys); seq keeps equal due times ordered
+        self.retry_queue: list[tuple[float, int, int, list[str]]] = []
+        self.sequence = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.stopping = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.deleted = 0
+        self.retried = 0
+        self.abandoned = 0
+
+    @property
+    def storage(self) -> StorageBackend:
+        return self._storage or get_storage()
+
+    async def start(self) -> None:
+        # asyncio primitives belong to the loop that first waits on them, so
+        # each startup gets fresh ones
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.wakeup = asyncio.Event()
+        self.stopping = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self.stopping.set()
+        self.wakeup.set()
+        if self.task is not None:
+            await self.task
+        pending = sum(len(keys) for _, _, _, keys in self.retry_queue)
+        if pending:
+            logger.warning("%d object deletions still queued at shutdown", pending)
+
+    async def delete(self, object_keys: list[str]) -> int:
+        """
+        Deletes the keys in concurrent batches and returns how many went
+        through; batches that failed are queued for retry.
+        """
+        keys = [key for key in dict.fromkeys(object_keys) if key]
+        batches = [
+            keys[start : start + self.batch_size]
+            for start in range(0, len(keys), self.batch_size)
+        ]
+        results = await asyncio.gather(*(self.attempt(batch, 1) for batch in batches))
+        return sum(len(batch) for batch, ok in zip(batches, results) if ok)
+
+    async def attempt(self, keys: list[str], attempts: int) -> bool:
+        async with self.semaphore:
+            try:
+                await run_s3_job(self.storage.delete_many, keys)
+            except StorageError as e:
+                self.schedule_retry(keys, attempts, e)
+                return False
+            except Exception as e:
+                # Anything else would be lost with the background task
+                logger.exception("Unexpected error deleting %d objects", len(keys))
+                self.schedule_retry(keys, attempts, e)
+                return False
+        self.deleted += len(keys)
+        return True
+
+    def schedule_retry(self, keys: list[str], attempts: int, error: Exception) -> None:
+        if attempts >= OBJECT_DELETE_MAX_ATTEMPTS:
+            self.abandoned += len(keys)
+            logger.error(
+                "Giving up deleting %d objects after %d attempts: %s", len(keys), attempts, error
+            )
+            return
+
+        logger.warning("Deleting %d objects failed, will retry: %s", len(keys), error)
+        due = time.monotonic() + backoff_delay(attempts)
+        heapq.heappush(self.retry_queue, (due, next(self.sequence), attempts + 1, keys))
+        self.wakeup.set()
+
+    async def run(self) -> None:
+        while not self.stopping.is_set():
+            timeout = None
+            if self.retry_queue:
+                timeout = max(self.retry_queue[0][0] - time.monotonic(), 0)
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            # Anything queued meanwhile is in the heap, so nothing is lost
+            self.wakeup.clear()
+
+            if self.stopping.is_set():
+                break
+            try:
+                await self.retry_due()
+            except Exception:
+                logger.exception("Object deletion retry failed")
+
+    async def retry_due(self) -> None:
+        now = time.monotonic()
+        due = []
+        while self.retry_queue and self.retry_queue[0][0] <= now:
+            _, _, attempts, keys = heapq.heappop(self.retry_queue)
+            due.append((keys, attempts))
+        self.retried += sum(len(keys) for keys, _ in due)
+        await asyncio.gather(*(self.attempt(keys, attempts) for keys, attempts in due))
+
+    def stats(self) -> dict:
+        return {
+            "deleted": self.deleted,
+            "retried": self.retried,
+            "abandoned": self.abandoned,
+            "queued_batches": len(self.retry_queue),
+            "queued_objects": sum(len(keys) for _, _, _, keys in self.retry_queue),
+        }
+
+
+object_deleter = ObjectDeleter()
@@ -0,0 +1,201 @@
+from api.utils.message import build_termii_payload, termi_send_url
+from api.v1.models.sms_outbox import SmsOutbox
+from datetime import datetime, timedelta, timezone
+from api.db.database import SessionLocal
+from sqlalchemy import func, or_
+import asyncio, httpx, logging, os
+
+logger = logging.getLogger(__name__)
+
+SMS_DISPATCHER_ENABLED = os.getenv("SMS_DISPATCHER_ENABLED", "True") == "True"
+SMS_CONCURRENCY = int(os.getenv("SMS_CONCURRENCY", 10))
+SMS_BATCH_SIZE = int(os.getenv("SMS_BATCH_SIZE", 50))
+SMS_POLL_INTERVAL = float(os.getenv("SMS_POLL_INTERVAL", 2))
+SMS_TIMEOUT = float(os.getenv("SMS_TIMEOUT", 10))
+SMS_MAX_ATTEMPTS = int(os.getenv("SMS_MAX_ATTEMPTS", 5))
+SMS_BACKOFF_BASE = float(os.getenv("SMS_BACKOFF_BASE", 5))
+SMS_BACKOFF_MAX = float(os.getenv("SMS_BACKOFF_MAX", 600))
+# How long a claimed message stays invisible to other dispatchers; if the
+# claiming worker dies it is picked up again after this.
+SMS_LEASE_SECONDS = float(os.getenv("SMS_LEASE_SECONDS", 60))
+
+
+def backoff_delay(attempts: int) -> float:
+    return min(SMS_BACKOFF_BASE * (2 ** (attempts - 1)), SMS_BACKOFF_MAX)
+
+
+def claim_due_messages(limit: int) -> list[tuple[int, str, str]]:
+    """
+    Leases up to `limit` due messages and returns (id, phone, message).
+
+    SKIP LOCKED lets several workers drain the outbox side by side without
+    ever handing the same message to two of them.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.now(timezone.utc)
+        messages = (
+            db.query(SmsOutbox)
+            .filter(
+                or_(SmsOutbox.status == "pending", SmsOutbox.status == "sending"),
+                SmsOutbox.next_attempt_at <= now,
+            )
+            .order_by(SmsOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for message in messages:
+            message.status = "sending"
+            message.attempts += 1
+            message.next_attempt_at = now + timedelta(seconds=SMS_LEASE_SECONDS)
+
+        claimed = [(m.id, m.phone_number, m.message) for m in messages]
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def record_results(results: list[tuple[int, str | None, str | None]]) -> None:
+    """
+    Stores the outcome of each delivery as (id, provider_message_id, error).
+    """
+    if not results:
+        return
+
+    db = SessionLocal()
+    try:
+        now = datetime.now(timezone.utc)
+        messages = {
+            m.id: m
+            for m in db.query(SmsOutbox).filter(
+                SmsOutbox.id.in_([message_id for message_id, _, _ in results])
+            )
+        }
+        for message_id, provider_message_id, error in results:
+            message = messages.get(message_id)
+            if message is None:
+                continue
+
+            if error is None:
+                message.status = "sent"
+                message.sent_at = now
+                message.provider_message_id = provider_message_id
+                message.last_error = None
+            elif message.attempts >= SMS_MAX_ATTEMPTS:
+                message.status = "failed"
+                message.last_error = error
+            else:
+                message.status = "pending"
+                message.last_error = error
+                message.next_attempt_at = now + timedelta(
+                    seconds=backoff_delay(message.attempts)
+                )
+        db.commit()
+    finally:
+        db.close()
+
+
+def outbox_stats() -> dict:
+    db = SessionLocal()
+    try:
+        counts = dict(
+            db.query(SmsOutbox.status, func.count(SmsOutbox.id))
+            .group_by(SmsOutbox.status)
+            .all()
+        )
+    finally:
+        db.close()
+    return {status: counts.get(status, 0) for status in ("pending", "sending", "sent", "failed")}
+
+
+class SmsDispatcher:
+    """
+    Background task that drains the SMS outbox through a pooled HTTP client.
+    """
+
+    def __init__(self, send_url: str = termi_send_url, concurrency: int = SMS_CONCURRENCY):
+        self.send_url = send_url
+        self.concurrency = concurrency
+        self.client: httpx.AsyncClient | None = None
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.task: asyncio.Task | None = None
+        self.stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(SMS_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+        )
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self.stopping.set()
+        if self.task is not None:
+            await self.task
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def run(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                sent = await self.drain_once()
+            except Exception:
+                logger.exception("SMS dispatcher iteration failed")
+                sent = 0
+
+            if sent < SMS_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), SMS_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain_once(self) -> int:
+        """
+        Sends one batch of due messages; returns how many were attempted.
+        """
+        claimed = await asyncio.to_thread(claim_due_messages, SMS_BATCH_SIZE)
+        if not claimed:
+            return 0
+
+        results = await asyncio.gather(
+            *(self.deliver(message_id, phone, text) for message_id, phone, text in claimed),
+            return_exceptions=True,
+        )
+        # One unexpected failure must not lose the outcome of the whole batch
+        results = [
+            (message_id, None, f"{type(result).__name__}: {result}")
+            if isinstance(result, BaseException)
+            else result
+            for (message_id, _, _), result in zip(claimed, results)
+        ]
+        await asyncio.to_thread(record_results, results)
+        return len(claimed)
+
+    async def deliver(self, message_id: int, phone_number: str, sms_content: str):
+        async with self.semaphore:
+            try:
+                response = await self.client.post(
+                    self.send_url, json=build_termii_payload(phone_number, sms_content)
+                )
+                if response.status_code >= 400:
+                    return message_id, None, f"HTTP {response.status_code}: {response.text[:200]}"
+            except httpx.HTTPError as exc:
+                return message_id, None, f"{type(exc).__name__}: {exc}"
+
+        # The provider accepted the message; an odd body must not turn that
+        # into a retry, which would send it twice
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            logger.warning(
+                "Unexpected Termii response for message %s: %s", message_id, response.text[:200]
+            )
+            return message_id, "", None
+        return message_id, str(body.get("message_id") or ""), None
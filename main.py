@@ -1,23 +1,89 @@
 import uvicorn
+import asyncio
+import os
 from contextlib import asynccontextmanager
 from typing import Union
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.requests import Request
-from api.db.database import create_database
+from api.db.database import (
+    async_db_engine,
+    create_database,
+    db_engine,
+    read_db_engine,
+    replica_monitor,
+    warm_up_async_pool,
+    warm_up_pool,
+)
+from api.utils.sql_instrumentation import (
+    SQL_INSTRUMENTATION_ENABLED,
+    RequestSqlStats,
+    current_sql_stats,
+    install_sql_instrumentation,
+    report_request_sql,
+)
+from api.utils.file_upload import shutdown_image_pools
+from api.utils.storage import STORAGE_BACKEND, STORAGE_LOCAL_ROOT, STORAGE_LOCAL_URL
+from fastapi.staticfiles import StaticFiles
+from api.v1.services.sms_dispatcher import SmsDispatcher, SMS_DISPATCHER_ENABLED
+from api.v1.services.object_deleter import object_deleter
+from api.utils.bed_allocation import category_genders
 from api.v1.routes import api_version_one
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_database()
+    await asyncio.to_thread(warm_up_pool)
+    # A replica that is down at startup is not fatal; reads use the primary
+    if replica_monitor is not None and await asyncio.to_thread(replica_monitor.is_usable):
+        await asyncio.to_thread(warm_up_pool, read_db_engine)
+    await warm_up_async_pool()
+    await asyncio.to_thread(category_genders.refresh)
+    sms_dispatcher = None
+    if SMS_DISPATCHER_ENABLED:
+        sms_dispatcher = SmsDispatcher()
+        await sms_dispatcher.start()
+    await object_deleter.start()
     yield
     ## write shutdown logic below yield
+    if sms_dispatcher is not None:
+        await sms_dispatcher.stop()
+    await object_deleter.stop()
+    shutdown_image_pools()
+    await async_db_engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
 
 
+if SQL_INSTRUMENTATION_ENABLED:
+    install_sql_instrumentation(db_engine)
+    install_sql_instrumentation(async_db_engine.sync_engine)
+    if read_db_engine is not None:
+        install_sql_instrumentation(read_db_engine)
+
+    # Count the SQL each request issues and report it as Server-Timing
+    @app.middleware("http")
+    async def sql_instrumentation(request: Request, call_next):
+        stats = RequestSqlStats()
+        token = current_sql_stats.set(stats)
+        try:
+            response = await call_next(request)
+        finally:
+            current_sql_stats.reset(token)
+
+        # Unmatched paths (404s, scanners) share one entry so the per-route
+        # metrics stay bounded
+        route = request.scope.get("route")
+        if route is not None:
+            report_request_sql(f"{request.method} {route.path}", stats)
+        else:
+            report_request_sql("<unmatched>", stats)
+        response.headers["Server-Timing"] = stats.server_timing()
+        return response
+
+
 
 
 origins = [
@@ -30,12 +96,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Server-Timing", "ETag", "Last-Modified"],
 )
 
 
 app.include_router(api_version_one)
 # app.include_router(users, tags=["Users"])
 
+# The local storage backend hands out URLs under STORAGE_LOCAL_URL
+if STORAGE_BACKEND == "local":
+    os.makedirs(STORAGE_LOCAL_ROOT, exist_ok=True)
+    app.mount(STORAGE_LOCAL_URL, StaticFiles(directory=STORAGE_LOCAL_ROOT), name="media")
+
 
 @app.get("/", tags=["Home"])
 async def get_root(request: Request) -> dict:
@@ -0,0 +1,115 @@
+"""
+Throughput of the register_user database path on the sync and async stacks.
+
+Each simulated registration does what the route does before the photo
+upload: look up the phone number, check for an existing user and allocate a
+bed, then rolls back so no beds are used up. "sync" runs it on a SessionLocal
+straight inside the coroutine, as the async routes did before; "async" runs it
+on an AsyncSession. A heartbeat task measures how long the event loop was
+blocked, which is what stalls every other request on the worker.
+
+    python -m tests.async_registration_benchmark --requests 300 --concurrency 30
+
+Needs a seeded database (a hall with a floor and a category) in DB_URL.
+"""
+from api.db.database import AsyncSessionLocal, SessionLocal
+from api.utils.bed_allocation import allocate_bed, validate_gender
+from api.v1.models.phone_number import PhoneNumber
+from api.v1.models.floor import HallFloors
+from api.v1.models.user import User
+from types import SimpleNamespace
+from sqlalchemy import select
+import argparse, asyncio, statistics, sys, time
+
+
+def pick_payload() -> SimpleNamespace:
+    db = SessionLocal()
+    try:
+        floor = db.query(HallFloors).filter(HallFloors.categories.any()).first()
+        if floor is None:
+            sys.exit("No floor with a category found; seed a hall first.")
+        return SimpleNamespace(
+            category=floor.categories[0].category_name,
+            age_range=(floor.age_ranges or [""])[0],
+            no_children=0,
+        )
+    finally:
+        db.close()
+
+
+async def register_sync(payload, number: str) -> None:
+    db = SessionLocal()
+    try:
+        phone = db.query(PhoneNumber).filter(PhoneNumber.phone_number == number).first()
+        if phone:
+            db.query(User).filter(User.phone_number_id == phone.id).first()
+        allocate_bed(db, validate_gender(payload.category), payload)
+        db.rollback()
+    finally:
+        db.close()
+
+
+async def register_async(payload, number: str) -> None:
+    async with AsyncSessionLocal() as db:
+        phone = await db.scalar(select(PhoneNumber).where(PhoneNumber.phone_number == number))
+        if phone:
+            await db.scalar(select(User.id).where(User.phone_number_id == phone.id))
+        await db.run_sync(allocate_bed, validate_gender(payload.category), payload)
+        await db.rollback()
+
+
+async def heartbeat(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst * 1000
+
+
+async def bench(stack: str, payload, requests: int, concurrency: int) -> dict:
+    register = register_sync if stack == "sync" else register_async
+    limiter = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with limiter:
+            started = time.perf_counter()
+            await register(payload, f"0700{i:07d}")
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(heartbeat(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+
+    latencies.sort()
+    return {
+        "stack": stack,
+        "req_per_s": requests / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "max_loop_lag_ms": await lag,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=30)
+    args = parser.parse_args()
+
+    payload = pick_payload()
+    print(f"{'stack':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'loop lag ms':>12}")
+    for stack in ("sync", "async"):
+        result = await bench(stack, payload, args.requests, args.concurrency)
+        print(
+            f"{result['stack']:<6} {result['req_per_s']:>8.0f} {result['p50_ms']:>8.2f} "
+            f"{result['p95_ms']:>8.2f} {result['max_loop_lag_ms']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Time spent deleting a gallery category's objects, old path versus new.
+
+  per-image  one delete request per image, in sequence, as
+             delete_image_category did inside its transaction
+  batched    ObjectDeleter: delete_objects batches of up to 1000 keys,
+             several in flight, after the commit
+
+Objects live on local disk (LocalStorage in a temp directory) with a fixed
+delay added to every request to stand in for the S3 round trip:
+
+    python -m tests.category_delete_benchmark --latency-ms 30
+"""
+from api.v1.services.object_deleter import ObjectDeleter
+from api.utils.storage import LocalStorage
+import argparse, asyncio, tempfile, time
+
+
+class SlowLocalStorage(LocalStorage):
+    def __init__(self, root: str, latency: float):
+        super().__init__(root=root, base_url="/media")
+        self.latency = latency
+        self.requests = 0
+
+    def delete_many(self, object_keys: list[str]) -> None:
+        time.sleep(self.latency)
+        self.requests += 1
+        super().delete_many(object_keys)
+
+
+def fill(storage: LocalStorage, count: int) -> list[str]:
+    keys = [f"/Camp/{i:06d}.jpg" for i in range(count)]
+    for key in keys:
+        storage.put(key, b"x" * 512, "image/jpeg")
+    return keys
+
+
+def per_image(storage: SlowLocalStorage, keys: list[str]) -> float:
+    started = time.perf_counter()
+    for key in keys:
+        storage.delete(key)
+    return (time.perf_counter() - started) * 1000
+
+
+def batched(storage: SlowLocalStorage, keys: list[str], batch_size: int, concurrency: int) -> float:
+    deleter = ObjectDeleter(storage=storage, batch_size=batch_size, concurrency=concurrency)
+    started = time.perf_counter()
+    asyncio.run(deleter.delete(keys))
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 5000])
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'images':>7} {'per-image ms':>13} {'requests':>9} {'batched ms':>11} {'requests':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as root:
+            storage = SlowLocalStorage(root, args.latency_ms / 1000)
+            old_ms = per_image(storage, fill(storage, size))
+            old_requests, storage.requests = storage.requests, 0
+            new_ms = batched(storage, fill(storage, size), args.batch_size, args.concurrency)
+            assert not list(storage.list_objects())
+
+        print(
+            f"{size:>7} {old_ms:>13.0f} {old_requests:>9} {new_ms:>11.0f} {storage.requests:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Local stand-in for Termii's /api/sms/send, for load-testing the SMS
+dispatcher offline.
+
+    FAKE_TERMII_LATENCY=0.3 FAKE_TERMII_FAILURE_RATE=0.05 \
+        uvicorn tests.fake_termii_server:app --port 7010
+
+then run the API with TERMI_SEND_URL=http://127.0.0.1:7010/api/sms/send.
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import asyncio, os, random, uuid
+
+LATENCY = float(os.getenv("FAKE_TERMII_LATENCY", 0.2))
+FAILURE_RATE = float(os.getenv("FAKE_TERMII_FAILURE_RATE", 0.0))
+
+app = FastAPI()
+received = {"count": 0}
+
+
+@app.post("/api/sms/send")
+async def send_sms(request: Request):
+    payload = await request.json()
+    await asyncio.sleep(random.uniform(0, 2 * LATENCY))
+
+    if random.random() < FAILURE_RATE:
+        return JSONResponse(status_code=503, content={"message": "Service unavailable"})
+
+    received["count"] += 1
+    return {
+        "code": "ok",
+        "message_id": uuid.uuid4().hex,
+        "message": "Successfully Sent",
+        "balance": 1000,
+        "user": payload.get("from"),
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return received
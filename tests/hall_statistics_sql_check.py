@@ -0,0 +1,77 @@
+"""
+Statements and database time for an all-halls occupancy dashboard, counted
+with the SQL instrumentation that feeds Server-Timing.
+
+  per-floor  what get_hall_statistics used to do, per hall: the hall, its
+             floors, then two COUNT(*) over users for every floor
+  per-hall   GET /hall/ then GET /analytics/{hall}/hall-statistics for
+             every hall, on the floor occupancy counters
+  all-halls  GET /analytics/hall-statistics: one statement
+
+Reads the halls already in the database in DB_URL; nothing is written.
+
+    python -m tests.hall_statistics_sql_check
+"""
+from api.utils.sql_instrumentation import (
+    RequestSqlStats,
+    current_sql_stats,
+    install_sql_instrumentation,
+)
+from api.v1.routes.analytics import get_all_hall_statistics, get_hall_statistics
+from api.db.database import SessionLocal, db_engine
+from api.v1.models.floor import HallFloors
+from api.v1.models.hall import Hall
+from api.v1.models.user import User
+import time
+
+
+def per_floor(db) -> None:
+    for (hall_name,) in db.query(Hall.hall_name).all():
+        hall = db.query(Hall).filter(Hall.hall_name == hall_name).first()
+        floors = db.query(HallFloors).filter(HallFloors.hall_id == hall.id).all()
+        for floor in floors:
+            db.query(User).filter(User.floor == floor.floor_id).count()
+            db.query(User).filter(
+                User.floor == floor.floor_id, User.active_status == "active"
+            ).count()
+
+
+def per_hall(db) -> None:
+    for hall in db.query(Hall).all():
+        get_hall_statistics(hall.hall_name, db)
+
+
+def all_halls(db) -> None:
+    get_all_hall_statistics(db)
+
+
+def measure(run) -> tuple[RequestSqlStats, float]:
+    stats = RequestSqlStats()
+    db = SessionLocal()
+    token = current_sql_stats.set(stats)
+    started = time.perf_counter()
+    try:
+        run(db)
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        current_sql_stats.reset(token)
+        db.close()
+    return stats, elapsed_ms
+
+
+def main():
+    install_sql_instrumentation(db_engine)
+    with SessionLocal() as db:
+        halls = db.query(Hall).count()
+        floors = db.query(HallFloors).count()
+    print(f"{halls} halls, {floors} floors")
+
+    print(f"{'path':>10} {'statements':>11} {'db ms':>8} {'total ms':>9}")
+    for name, run in (("per-floor", per_floor), ("per-hall", per_hall), ("all-halls", all_halls)):
+        measure(run)  # warm up
+        stats, elapsed_ms = measure(run)
+        print(f"{name:>10} {stats.statements:>11} {stats.db_ms:>8.1f} {elapsed_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
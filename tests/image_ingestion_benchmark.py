@@ -0,0 +1,83 @@
+"""
+CPU time and peak memory of clean_image on phone-sized photos, with the
+JPEG draft decode on and off.
+
+"full" decodes the whole photo before downscaling to 512x512, as uploads
+did before; "draft" lets libjpeg decode at the smallest DCT scale that still
+covers 512x512. Each measurement runs in a fresh process so its peak RSS
+isn't hidden by an earlier, larger run.
+
+    python -m tests.image_ingestion_benchmark
+    python -m tests.image_ingestion_benchmark --photos ~/Pictures/*.jpg
+
+Without --photos, synthetic 12 and 48 megapixel JPEGs and a 12 megapixel
+PNG are generated.
+"""
+from api.utils.file_upload import ImageRejected, clean_image
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from io import BytesIO
+import argparse, numpy, os, resource, time
+
+
+def synthetic_photo(width: int, height: int, image_format: str) -> bytes:
+    # Smooth gradients plus sensor-like noise compress about like a photo
+    rng = numpy.random.default_rng(0)
+    y, x = numpy.mgrid[0:height, 0:width].astype(numpy.float32)
+    base = numpy.stack(
+        [128 + 100 * numpy.sin(x / 400), 128 + 100 * numpy.cos(y / 300), (x + y) % 256],
+        axis=-1,
+    )
+    pixels = numpy.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(numpy.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format=image_format, quality=90)
+    return buffer.getvalue()
+
+
+def measure(file_bytes: bytes, draft: bool, repeats: int) -> tuple[float, float]:
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.process_time()
+    for _ in range(repeats):
+        clean_image(file_bytes, target_size=(512, 512), crop=True, draft=draft)
+    cpu_ms = (time.process_time() - started) * 1000 / repeats
+    # ru_maxrss is in KiB on Linux
+    peak_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024
+    return cpu_ms, peak_mb
+
+
+def in_fresh_process(file_bytes: bytes, draft: bool, repeats: int) -> tuple[float, float]:
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(measure, file_bytes, draft, repeats).result()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--photos", nargs="*", default=[])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.photos:
+        photos = {os.path.basename(path): open(path, "rb").read() for path in args.photos}
+    else:
+        photos = {
+            "12MP jpeg": synthetic_photo(4032, 3024, "JPEG"),
+            "48MP jpeg": synthetic_photo(8064, 6048, "JPEG"),
+            "12MP png": synthetic_photo(4032, 3024, "PNG"),
+        }
+
+    print(f"{'photo':<14} {'MB':>6} {'full ms':>8} {'draft ms':>9} {'full MB':>8} {'draft MB':>9}")
+    for name, file_bytes in photos.items():
+        try:
+            full_ms, full_mb = in_fresh_process(file_bytes, False, args.repeats)
+            draft_ms, draft_mb = in_fresh_process(file_bytes, True, args.repeats)
+        except ImageRejected as e:
+            print(f"{name:<14} rejected: {e.detail}")
+            continue
+        print(
+            f"{name:<14} {len(file_bytes) / 1e6:>6.1f} {full_ms:>8.0f} {draft_ms:>9.0f} "
+            f"{full_mb:>8.0f} {draft_mb:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
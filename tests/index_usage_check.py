@@ -0,0 +1,122 @@
+"""
+Checks that the hot query paths can be served from indexes.
+
+Runs the real allocation, lookup, listing and analytics code against the
+database in DB_URL, captures every SELECT/UPDATE it issues, and EXPLAINs each
+one with sequential scans disabled. Any Seq Scan left in a plan means no
+index can serve that table for that query. Everything runs inside an outer
+transaction that is rolled back at the end; the session joins it through
+savepoints, so even helpers that commit write nothing.
+
+    python -m tests.index_usage_check
+
+The database needs at least one hall with a floor and a category linked to
+it. Exits non-zero if a query falls back to a sequential scan.
+"""
+from api.utils.bed_allocation import allocate_bed, allocate_backup_bed, compute_hall_statistics
+from api.v1.routes.hall_registration import get_registered_user_by_phone
+from api.v1.routes.analytics import get_hall_statistics
+from api.utils.floor_occupancy import reconcile_floor_occupancy
+from api.utils.user_listing import list_user_summaries
+from api.db.database import db_engine
+from api.v1.models.phone_number import PhoneNumber
+from api.v1.models.floor import HallFloors
+from api.v1.models.hall import Hall
+from fastapi import HTTPException
+from types import SimpleNamespace
+from sqlalchemy.orm import Session
+from sqlalchemy import event
+import json, sys
+
+# Lookup tables with a handful of rows; a scan over them is expected
+SMALL_TABLES = {"halls", "categories", "floor_category_association", "image_categories"}
+
+captured = []
+
+
+def capture(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "WITH")):
+        captured.append((statement, parameters))
+
+
+def seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def pick_fixtures(db):
+    floor = db.query(HallFloors).filter(HallFloors.categories.any()).first()
+    if floor is None:
+        sys.exit("No floor with a category found; seed a hall first.")
+    hall = db.query(Hall).filter(Hall.id == floor.hall_id).one()
+    payload = SimpleNamespace(
+        category=floor.categories[0].category_name,
+        age_range=(floor.age_ranges or [""])[0],
+        no_children=0,
+    )
+    phone = db.query(PhoneNumber).first()
+    return hall, floor, payload, phone
+
+
+def exercise(db, hall, floor, payload, phone) -> None:
+    allocate_bed(db, hall.gender, payload)
+    allocate_backup_bed(db, hall.gender, payload)
+    compute_hall_statistics(db, hall)
+    get_hall_statistics(hall.hall_name, db)
+    list_user_summaries(db, limit=50, include_total=True, status="active")
+    list_user_summaries(db, limit=50, include_total=True, floor=floor.floor_no)
+    if phone:
+        try:
+            get_registered_user_by_phone(phone.phone_number, db)
+        except HTTPException:
+            pass
+    reconcile_floor_occupancy(db, dry_run=True)
+
+
+def main() -> int:
+    connection = db_engine.connect()
+    outer = connection.begin()
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        fixtures = pick_fixtures(db)
+        event.listen(db_engine, "before_cursor_execute", capture)
+        try:
+            exercise(db, *fixtures)
+        finally:
+            event.remove(db_engine, "before_cursor_execute", capture)
+    finally:
+        db.close()
+        outer.rollback()
+        connection.close()
+
+    failures = 0
+    raw = db_engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("SET enable_seqscan = off")
+        for statement, parameters in captured:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scanned = [t for t in seq_scans(plan[0]["Plan"]) if t not in SMALL_TABLES]
+            summary = " ".join(statement.split())[:100]
+            if scanned:
+                failures += 1
+                print(f"SEQ SCAN on {', '.join(scanned)}: {summary}")
+            else:
+                print(f"ok: {summary}")
+        raw.rollback()
+    finally:
+        raw.close()
+
+    print(f"\n{len(captured)} statements checked, {failures} with sequential scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
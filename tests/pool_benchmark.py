@@ -0,0 +1,72 @@
+"""
+Per-request latency of each DB_POOL_MODE against the database in DB_URL.
+
+Each simulated request opens a session, runs the same two reads the
+hall-statistics and user lookup routes do, and closes it, mirroring get_db.
+Requests run from a thread pool the size of the server's threadpool.
+
+    python -m tests.pool_benchmark --requests 500 --concurrency 20
+
+Point DB_URL at the real database host to see the TCP/TLS handshake cost
+that NullPool pays on every request; over a local socket the gap is small.
+"""
+from api.db.database import POOL_MODES, pool_options, warm_up_pool
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+import argparse, os, statistics, time
+
+
+def one_request(Session) -> float:
+    start = time.perf_counter()
+    db = Session()
+    try:
+        db.execute(
+            text("SELECT coalesce(sum(no_beds), 0), coalesce(sum(all_users_count), 0) FROM hall_floors")
+        ).one()
+        db.execute(text("SELECT id FROM phone_numbers ORDER BY id LIMIT 1")).first()
+    finally:
+        db.close()
+    return (time.perf_counter() - start) * 1000
+
+
+def bench(url: str, mode: str, requests: int, concurrency: int) -> dict:
+    engine = create_engine(url, **pool_options(url, mode))
+    Session = sessionmaker(bind=engine)
+    try:
+        warm_up_pool(engine)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = sorted(pool.map(lambda _: one_request(Session), range(requests)))
+        elapsed = time.perf_counter() - started
+    finally:
+        engine.dispose()
+
+    return {
+        "mode": mode,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "mean_ms": statistics.fmean(latencies),
+        "req_per_s": requests / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", default=list(POOL_MODES), choices=POOL_MODES)
+    args = parser.parse_args()
+
+    url = os.getenv("DB_URL")
+    print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'req/s':>8}")
+    for mode in args.modes:
+        result = bench(url, mode, args.requests, args.concurrency)
+        print(
+            f"{result['mode']:<10} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+            f"{result['mean_ms']:>8.2f} {result['req_per_s']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Cost of presigning download URLs for one list response.
+
+Compares, for 100 to 10k objects:
+  per-key    boto3's generate_presigned_url for each object
+  batch      S3Storage.sign_urls, signing every key in one pass (a cold cache)
+  cached     PresignedUrlCache.get_many once every URL is cached
+
+Signing is local HMAC work, so any AWS credentials will do:
+
+    AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=y S3_BUCKET_NAME=my-bucket \\
+        python -m tests.presigned_url_benchmark
+"""
+from api.utils.presigned_urls import PresignedUrlCache
+from api.utils.storage import S3Storage
+import argparse, time
+
+
+def timed(func) -> float:
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10_000])
+    args = parser.parse_args()
+
+    storage = S3Storage()
+    client = storage.client
+    print(f"{'urls':>6} {'per-key ms':>11} {'batch ms':>9} {'cached ms':>10}")
+    for size in args.sizes:
+        keys = [f"users/0800{i:07d}/user_{i}.jpg" for i in range(size)]
+        cache = PresignedUrlCache(signer=storage.sign_urls, max_entries=size)
+
+        per_key = timed(
+            lambda: [
+                client.generate_presigned_url(
+                    "get_object", Params={"Bucket": storage.bucket, "Key": key}, ExpiresIn=3600
+                )
+                for key in keys
+            ]
+        )
+        batch = timed(lambda: storage.sign_urls(keys, 3600))
+        cache.get_many(keys)
+        cached = timed(lambda: cache.get_many(keys))
+
+        print(f"{size:>6} {per_key:>11.1f} {batch:>9.1f} {cached:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()